@@ -1,173 +1,3600 @@
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import cProfile
+import io
+import itertools
 import time
 import functools
+import hashlib
+import heapq
+import inspect
+import json
 import logging
+import logging.handlers
+import math
+import os
+import pickle
+import pstats
+import queue
 import random
-from typing import Any, Callable, Dict, List
+import reprlib
+import signal
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import tracemalloc
+import weakref
+import types
+import typing
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Collection, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # Statistics engine falls back to array('d') + pure Python
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared-memory cache writers are only serialised per process
+    fcntl = None
 
 # --- Configuration & Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Mock database for user roles
-USER_ROLES = {
-    "admin_user": "admin",
-    "analyst_user": "analyst",
-    "guest_user": "guest"
-}
+_ROLE_VERSIONS = itertools.count(1)
+
+
+class _RoleTable(dict):
+    """
+    dict that stamps itself with a new, globally unique `version` on every
+    mutation, so require_role can tell when its cached decisions are stale.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = next(_ROLE_VERSIONS)
+
+    def _touch(self):
+        self.version = next(_ROLE_VERSIONS)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self._touch()
+        return result
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._touch()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._touch()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self._touch()
+        return result
+
+
+# Mock database for user roles
+USER_ROLES = _RoleTable({
+    "admin_user": "admin",
+    "analyst_user": "analyst",
+    "guest_user": "guest"
+})
+
+# Per-thread / per-task identity of the logged-in user (see set_current_user).
+# _USER_UNSET means "nobody logged in here, fall back to CURRENT_USER"; an
+# explicit None means anonymous.
+_USER_UNSET: Any = object()
+_current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_user", default=_USER_UNSET)
+
+# Legacy process-wide session, only consulted when no context-local user is set
+CURRENT_USER = None
+
+# Global off-switch for validate_input_types (e.g. DECORATORS_VALIDATE=0 in production)
+VALIDATION_ENABLED = os.environ.get("DECORATORS_VALIDATE", "1") != "0"
+
+# Where DataProcessor finds "<dataset_id>.f64" files (raw little-endian float64 rows)
+DATASET_DIR = os.environ.get("DECORATORS_DATASET_DIR", os.path.join(tempfile.gettempdir(), "decorators_datasets"))
+
+# Where @profiled functions write their pstats / allocation reports
+PROFILE_DIR = os.environ.get("DECORATORS_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "decorators_profiles"))
+
+# Optional on-disk cache tier shared by all workers on the host (disabled when unset)
+CACHE_DB_PATH = os.environ.get("DECORATORS_CACHE_DB")
+
+# Optional file where hot cache keys are recorded at exit and replayed at startup
+HOT_KEYS_PATH = os.environ.get("DECORATORS_HOT_KEYS")
+
+# Opt-in spans (DECORATORS_TRACING=1). Read when a function is decorated, so
+# functions decorated while it is off carry no tracing code at all.
+TRACING_ENABLED = os.environ.get("DECORATORS_TRACING") == "1"
+
+# How many finished spans are kept in memory for export
+TRACE_BUFFER_SIZE = int(os.environ.get("DECORATORS_TRACE_BUFFER", "10000"))
+
+# Optional Chrome trace-event file written at the end of the simulation
+TRACE_PATH = os.environ.get("DECORATORS_TRACE_FILE")
+
+# Optional shared-memory cache tier that all worker processes on the host attach to
+SHARED_CACHE_ENABLED = os.environ.get("DECORATORS_SHARED_CACHE") == "1"
+
+
+# --- Tracing (Spans) ---
+_SPAN_IDS = itertools.count(1)
+
+# The span whose code is currently running in this thread / task
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+# Finished spans, oldest dropped first once TRACE_BUFFER_SIZE is reached
+_SPAN_BUFFER: "deque[Span]" = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+class Span:
+    """
+    One timed unit of work. `parent_id` links it to the span that was
+    current when it started; `trace_id` is the id of the root span.
+    """
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "start_ns", "end_ns", "thread_id", "attributes")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = next(_SPAN_IDS)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes if attributes is not None else {}
+        self.end_ns: Optional[int] = None
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def duration_ns(self) -> Optional[int]:
+        return None if self.end_ns is None else self.end_ns - self.start_ns
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name, "span_id": self.span_id, "parent_id": self.parent_id,
+            "trace_id": self.trace_id, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ns": self.duration_ns, "thread_id": self.thread_id, "attributes": self.attributes,
+        }
+
+
+def _open_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Tuple[Span, contextvars.Token]:
+    span = Span(name, _current_span.get(), attributes)
+    return span, _current_span.set(span)
+
+
+def _close_span(span: Span, token: contextvars.Token, error: Optional[BaseException] = None) -> None:
+    span.end_ns = time.perf_counter_ns()
+    if error is not None:
+        span.attributes["error"] = repr(error)
+    _current_span.reset(token)
+    _SPAN_BUFFER.append(span)  # deque.append is atomic; no lock on the hot path
+
+
+def get_current_span() -> Optional[Span]:
+    """Returns the innermost open span of the calling thread / task."""
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def trace_span(name: str, **attributes):
+    """
+    Opens a child of the current span for the duration of the block:
+
+        with trace_span("parse", rows=n) as span:
+            ...
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    span, token = _open_span(name, attributes)
+    try:
+        yield span
+    except BaseException as e:
+        _close_span(span, token, e)
+        raise
+    _close_span(span, token)
+
+
+def _with_span(func: Callable, span_name: str) -> Callable:
+    """Wraps `func` so every call runs inside a span (used by traced, log_execution and compose)."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            span, token = _open_span(span_name)
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as e:
+                _close_span(span, token, e)
+                raise
+            _close_span(span, token)
+            return result
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            span, token = _open_span(span_name)
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                _close_span(span, token, e)
+                raise
+            _close_span(span, token)
+            return result
+
+    return wrapper
+
+
+def traced(func: Optional[Callable] = None, *, name: Optional[str] = None) -> Callable:
+    """
+    Runs every call of the function inside a span named after its qualname.
+    Returns the function untouched when TRACING_ENABLED is off.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if not TRACING_ENABLED:
+            return func
+        return _with_span(func, name or func.__qualname__)
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_spans(trace_id: Optional[int] = None) -> List[Span]:
+    """Snapshot of the finished spans in the buffer, optionally for one trace."""
+    spans = list(_SPAN_BUFFER)
+    if trace_id is not None:
+        spans = [s for s in spans if s.trace_id == trace_id]
+    return spans
+
+
+def clear_spans() -> None:
+    _SPAN_BUFFER.clear()
+
+
+def export_spans_jsonl(path: str, spans: Optional[Iterable[Span]] = None) -> int:
+    """Writes one JSON object per span; returns the number written."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for span in (get_spans() if spans is None else spans):
+            f.write(json.dumps(span.to_dict(), default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def export_chrome_trace(path: str, spans: Optional[Iterable[Span]] = None) -> int:
+    """
+    Writes spans in the Chrome trace-event format ("X" complete events,
+    microsecond timestamps), loadable in chrome://tracing or Perfetto.
+    """
+    pid = os.getpid()
+    events = []
+    for span in (get_spans() if spans is None else spans):
+        events.append({
+            "name": span.name, "cat": "span", "ph": "X", "pid": pid, "tid": span.thread_id,
+            "ts": span.start_ns / 1000, "dur": (span.duration_ns or 0) / 1000,
+            "args": {"span_id": span.span_id, "parent_id": span.parent_id,
+                     "trace_id": span.trace_id, **span.attributes},
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+    return len(events)
+
+
+# --- Decorator 1: Execution Logger ---
+class _LazyCallRepr:
+    """
+    Renders "name(arg, kw=value)" only when a handler actually emits the
+    record, with each argument's repr capped at `max_repr` characters.
+    """
+    __slots__ = ("name", "args", "kwargs", "max_repr")
+
+    def __init__(self, name: str, args: tuple, kwargs: dict, max_repr: int):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.max_repr = max_repr
+
+    def __str__(self):
+        shorten = reprlib.Repr()
+        shorten.maxstring = shorten.maxother = self.max_repr
+        parts = [shorten.repr(a) for a in self.args]
+        parts += [f"{k}={shorten.repr(v)}" for k, v in self.kwargs.items()]
+        return f"{self.name}({', '.join(parts)})"
+
+
+class _LazyTruncated:
+    """Defers str(value)[:limit] until the log record is formatted."""
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        return str(self.value)[:self.limit]
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that renders only the message on the caller's thread.
+
+    The %-arguments (including log_execution's capped argument reprs) must
+    be rendered before the record is queued: the listener may run after the
+    function has mutated them, and queued records would otherwise keep large
+    arguments and traceback frames alive. Unlike the stock prepare(), the
+    full handler format (timestamp, level, ...) is still applied by the
+    listener, so it is not done twice.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # Drop the traceback (and the frames it pins)
+        return record
+
+
+_QUEUE_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+
+def enable_async_logging(target: Optional[logging.Logger] = None) -> logging.handlers.QueueListener:
+    """
+    Moves formatting and I/O for `target` (the root logger by default) onto
+    a background QueueListener thread; callers only pay for rendering the
+    message (with capped argument reprs) and a queue put.
+    """
+    global _QUEUE_LISTENER
+    if _QUEUE_LISTENER is not None:
+        return _QUEUE_LISTENER
+
+    target = target or logging.getLogger()
+    handlers = list(target.handlers)
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    for handler in handlers:
+        target.removeHandler(handler)
+    target.addHandler(_DeferredQueueHandler(log_queue))
+
+    _QUEUE_LISTENER = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _QUEUE_LISTENER.start()
+    return _QUEUE_LISTENER
+
+
+def disable_async_logging(target: Optional[logging.Logger] = None) -> None:
+    """Flushes the background writer and restores the original handlers."""
+    global _QUEUE_LISTENER
+    if _QUEUE_LISTENER is None:
+        return
+    target = target or logging.getLogger()
+    _QUEUE_LISTENER.stop()
+    for handler in list(target.handlers):
+        if isinstance(handler, _DeferredQueueHandler):
+            target.removeHandler(handler)
+    for handler in _QUEUE_LISTENER.handlers:
+        target.addHandler(handler)
+    _QUEUE_LISTENER = None
+
+
+def log_execution(func: Optional[Callable] = None, *, level: int = logging.INFO,
+                  sample_rate: float = 1.0, max_repr: int = 200) -> Callable:
+    """
+    Logs the start and end of a function execution, including arguments.
+
+    Nothing is formatted unless `level` is enabled, only a `sample_rate`
+    fraction of calls is traced, and argument reprs are built lazily and
+    capped at `max_repr` characters. Exceptions are always logged. With
+    TRACING_ENABLED, every call also runs inside a span, sampled or not.
+    """
+    if not 0.0 <= sample_rate <= 1.0:
+        raise ValueError("sample_rate must be between 0 and 1")
+
+    def decorator(func: Callable) -> Callable:
+        name = func.__name__
+        qualname = func.__qualname__
+
+        def should_trace() -> bool:
+            return logger.isEnabledFor(level) and (sample_rate >= 1.0 or random.random() < sample_rate)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                sampled = should_trace()
+                if sampled:
+                    logger.log(level, "Adding call to stack: %s", _LazyCallRepr(name, args, kwargs, max_repr))
+
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    logger.error("Function %s raised exception: %s", name, e)
+                    raise
+
+                if sampled:
+                    logger.log(level, "Function %s returned: %s...", name, _LazyTruncated(result, 50))
+                return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                sampled = should_trace()
+                if sampled:
+                    logger.log(level, "Adding call to stack: %s", _LazyCallRepr(name, args, kwargs, max_repr))
+
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    logger.error("Function %s raised exception: %s", name, e)
+                    raise
+
+                if sampled:
+                    logger.log(level, "Function %s returned: %s...", name, _LazyTruncated(result, 50))  # Truncate long output
+                return result
+
+        return _with_span(wrapper, qualname) if TRACING_ENABLED else wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+# --- Decorator 2: Performance Timer ---
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with log-linear buckets.
+    Durations are recorded in nanoseconds; each power-of-two range is split
+    into 128 linear sub-buckets, giving <1% relative error on percentiles
+    at a fixed memory cost, whatever the number of recorded calls.
+    """
+
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    MAX_SHIFT = 36  # Largest tracked value is ~2^44 ns (about 4.9 hours)
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counts = [0] * ((self.MAX_SHIFT + 2) * self.SUB_BUCKETS)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @classmethod
+    def _index(cls, value_ns: int) -> int:
+        shift = value_ns.bit_length() - cls.SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            return value_ns
+        shift = min(shift, cls.MAX_SHIFT)
+        return (shift * cls.SUB_BUCKETS) + min(value_ns >> shift, 2 * cls.SUB_BUCKETS - 1)
+
+    @classmethod
+    def _lower_bound(cls, index: int) -> int:
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = (index >> cls.SUB_BUCKET_BITS) - 1
+        return (index - shift * cls.SUB_BUCKETS) << shift
+
+    def record(self, value_ns: int) -> None:
+        index = self._index(value_ns)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_ns += value_ns
+            if value_ns > self.max_ns:
+                self.max_ns = value_ns
+
+    def percentile(self, pct: float) -> int:
+        """Returns the recorded value (ns) at or below which pct% of calls fall."""
+        with self._lock:
+            if not self.count:
+                return 0
+            target = max(1, int(round(self.count * pct / 100.0)))
+            seen = 0
+            for index, bucket in enumerate(self._counts):
+                seen += bucket
+                if seen >= target:
+                    return min(self._lower_bound(index), self.max_ns)
+            return self.max_ns
+
+    def summary(self) -> Dict[str, Any]:
+        """count, mean, p50/p90/p99 and max, with durations in milliseconds."""
+        count = self.count
+        return {
+            "name": self.name,
+            "count": count,
+            "mean_ms": (self.total_ns / count / 1e6) if count else 0.0,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p90_ms": self.percentile(90) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self.count = self.total_ns = self.max_ns = 0
+
+
+# One histogram per decorated function, keyed by qualified name
+_HISTOGRAMS: Dict[str, LatencyHistogram] = {}
+_HISTOGRAMS_LOCK = threading.Lock()
+
+
+def get_histogram(name: str) -> LatencyHistogram:
+    with _HISTOGRAMS_LOCK:
+        histogram = _HISTOGRAMS.get(name)
+        if histogram is None:
+            histogram = _HISTOGRAMS[name] = LatencyHistogram(name)
+        return histogram
+
+
+def latency_report() -> List[Dict[str, Any]]:
+    """Summaries of every measured function."""
+    with _HISTOGRAMS_LOCK:
+        histograms = list(_HISTOGRAMS.values())
+    return [h.summary() for h in histograms]
+
+
+def dump_histograms_json(path: Optional[str] = None) -> str:
+    """Serialises all histogram summaries as JSON, optionally writing them to `path`."""
+    payload = json.dumps(latency_report(), indent=2)
+    if path is not None:
+        with open(path, "w") as f:
+            f.write(payload)
+    return payload
+
+
+def start_latency_reporter(interval: float = 60.0) -> threading.Event:
+    """
+    Logs a latency summary for every measured function each `interval`
+    seconds from a daemon thread. Set the returned Event to stop it.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            for summary in latency_report():
+                if summary["count"]:
+                    logger.info(
+                        "LATENCY: %(name)s n=%(count)d mean=%(mean_ms).2fms p50=%(p50_ms).2fms "
+                        "p90=%(p90_ms).2fms p99=%(p99_ms).2fms max=%(max_ms).2fms", summary
+                    )
+
+    threading.Thread(target=run, name="latency-reporter", daemon=True).start()
+    return stop
+
+
+def measure_time(func: Optional[Callable] = None, *, log_calls: bool = False) -> Callable:
+    """
+    Records the execution time of the decorated function into its
+    LatencyHistogram (see latency_report / dump_histograms_json).
+    Nothing is logged per call unless log_calls=True.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        histogram = get_histogram(func.__qualname__)
+
+        def record(run_time: int) -> None:
+            histogram.record(run_time)
+            if log_calls:
+                logger.info(f"PERFORMANCE: {func.__name__} took {run_time / 1e9:.4f} seconds")
+
+        if inspect.iscoroutinefunction(func):
+            # Times the awaited work, not just the creation of the coroutine
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start_time = time.perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record(time.perf_counter_ns() - start_time)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start_time = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    record(time.perf_counter_ns() - start_time)
+
+        wrapper.histogram = histogram
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+# --- Decorator 3: Role-Based Access Control (Decorator with Arguments) ---
+def set_current_user(user: Optional[str]) -> contextvars.Token:
+    """
+    Logs `user` in for the current thread / asyncio task only; None logs
+    it out (anonymous, even if the legacy CURRENT_USER is set).
+    Pass the returned token to reset_current_user() to restore the previous user.
+    """
+    return _current_user.set(user)
+
+
+def reset_current_user(token: contextvars.Token) -> None:
+    _current_user.reset(token)
+
+
+def get_current_user() -> Optional[str]:
+    user = _current_user.get()
+    return CURRENT_USER if user is _USER_UNSET else user
+
+
+@contextlib.contextmanager
+def logged_in_as(user: str):
+    """with logged_in_as("admin_user"): ...  (context-local, restored on exit)"""
+    token = _current_user.set(user)
+    try:
+        yield user
+    finally:
+        _current_user.reset(token)
+
+
+def _compile_authorizer(allowed_roles: List[str], func_name: str) -> Callable[[], None]:
+    """
+    Builds the access check used by require_role (and compose).
+    Roles are compiled to a frozenset once, and each user's decision is
+    cached until USER_ROLES is modified.
+    """
+    allowed = frozenset(allowed_roles)
+    max_decisions = 1024
+    # user -> (USER_ROLES version, granted, role)
+    decisions: Dict[str, Tuple[int, bool, Optional[str]]] = {}
+
+    def authorize() -> None:
+        user = _current_user.get()
+        if user is _USER_UNSET:
+            user = CURRENT_USER
+        if not user:
+            raise PermissionError("Authentication required: No user logged in.")
+
+        table = USER_ROLES
+        version = getattr(table, "version", None)
+        decision = decisions.get(user)
+        if decision is None or version is None or decision[0] != version:
+            user_role = table.get(user)
+            decision = (version, user_role in allowed, user_role)
+            if version is not None:
+                if len(decisions) >= max_decisions:
+                    decisions.clear()
+                decisions[user] = decision
+
+        if not decision[1]:
+            raise PermissionError(
+                f"Access Denied: User '{user}' (Role: {decision[2]}) "
+                f"does not have required permissions: {allowed_roles}"
+            )
+
+        logger.info("ACCESS GRANTED: %s authorized for %s", user, func_name)
+
+    return authorize
+
+
+def require_role(allowed_roles: List[str]) -> Callable:
+    """
+    Enforces that the current user (see set_current_user) has one of the
+    allowed roles.
+
+    Roles are compiled to a frozenset once, and each user's decision is
+    cached per function until USER_ROLES is modified.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        authorize = _compile_authorizer(allowed_roles, func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            # Each asyncio task carries its own copy of the user context
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                authorize()
+                return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                authorize()
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# --- Decorator 4: In-Memory Caching (Memoization) ---
+_MISSING = object()  # Sentinel: distinguishes "not cached" from a cached None
+
+
+class _KwdMark:
+    """Separates positional from keyword arguments inside a cache key."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<kwargs>"
+
+
+_KWD_MARK = _KwdMark()
+
+
+def _make_key(args: tuple, kwargs: dict) -> Hashable:
+    """
+    Builds a cache key from call arguments.
+    Hashable arguments are used directly (no string formatting at all);
+    only unhashable ones (lists, dicts, ...) fall back to repr(). Argument
+    types are part of the key, so f(1), f(1.0) and f(True) stay separate
+    entries (like lru_cache(typed=True)).
+    """
+    key = args + tuple(map(type, args))
+    if kwargs:
+        # Sorting makes f(a=1, b=2) and f(b=2, a=1) share an entry
+        items = tuple(sorted(kwargs.items()))
+        key += (_KWD_MARK,) + items + tuple(type(value) for _, value in items)
+    try:
+        hash(key)
+    except TypeError:
+        return ("__repr__", repr(args), repr(sorted(kwargs.items())))
+    return key
+
+
+# tag -> generation. invalidate(tag) just bumps the counter (O(1)); entries
+# remember the generations they were stored under and go stale on mismatch.
+_TAG_GENERATIONS: Dict[Hashable, int] = {}
+_TAG_LOCK = threading.Lock()
+# Cross-process tiers (DiskCache, SharedMemoryCache) that must hear about invalidate(tag)
+_SHARED_TIERS: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def invalidate(tag: Hashable) -> None:
+    """Marks every cached result carrying `tag` as stale, in every cache_result cache."""
+    with _TAG_LOCK:
+        _TAG_GENERATIONS[tag] = _TAG_GENERATIONS.get(tag, 0) + 1
+    for tier in list(_SHARED_TIERS):
+        tier.invalidate_tag(tag)
+
+
+def invalidate_function(func: Callable) -> None:
+    """Drops every cached result of a cache_result / compose-decorated function."""
+    func.cache.invalidate_all()
+
+
+def _snapshot_tags(tags: Iterable[Hashable]) -> Tuple[Tuple[Hashable, int], ...]:
+    generations = _TAG_GENERATIONS
+    return tuple((tag, generations.get(tag, 0)) for tag in tags)
+
+
+def _compile_tagger(func: Callable, spec: Union[str, Callable, None]) -> Optional[Callable[[tuple, dict], tuple]]:
+    """
+    Turns cache_result's `tags` option into a function of (args, kwargs).
+    A string names an argument: tags="dataset_id" tags each entry with
+    ("dataset_id", <value>). A callable receives the call's arguments and
+    returns an iterable of tags.
+    """
+    if spec is None:
+        return None
+    if callable(spec):
+        return lambda args, kwargs: tuple(spec(*args, **kwargs))
+
+    name = spec
+    parameters = list(inspect.signature(inspect.unwrap(func)).parameters.values())
+    names = [p.name for p in parameters]
+    if name not in names:
+        raise ValueError(f"{func.__qualname__} has no argument named {name!r} to tag by")
+    index = names.index(name)
+    default = parameters[index].default
+
+    def tagger(args, kwargs):
+        if name in kwargs:
+            return ((name, kwargs[name]),)
+        if index < len(args):
+            return ((name, args[index]),)
+        return ((name, default),)
+
+    return tagger
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Default cache sizer: deep sys.getsizeof over containers and object
+    attributes, counting shared objects once. Buffers whose __sizeof__
+    leaves out the data they expose (memoryviews, NumPy views) are charged
+    their `nbytes` on top.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, memoryview):
+        return size + obj.nbytes
+    if np is not None and isinstance(obj, np.ndarray):
+        return size if obj.base is None else size + obj.nbytes  # An owned buffer is already in __sizeof__
+
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, Mapping):
+        for k, v in obj.items():
+            size += estimate_size(k, seen) + estimate_size(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += estimate_size(item, seen)
+    else:
+        attributes = getattr(obj, "__dict__", None)
+        if attributes is not None:
+            size += estimate_size(attributes, seen)
+        for name in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, name):
+                size += estimate_size(getattr(obj, name), seen)
+    return size
+
+
+class _CacheEntry:
+    __slots__ = ("value", "expires_at", "generation", "tags", "size", "cost", "frequency", "heap_seq")
+
+    def __init__(self, value: Any, expires_at: Optional[float], generation: int,
+                 tags: Tuple[Tuple[Hashable, int], ...] = (), size: int = 0, cost: float = 0.0):
+        self.value = value
+        self.expires_at = expires_at
+        self.generation = generation
+        self.tags = tags
+        self.size = size
+        self.cost = cost
+        self.frequency = 1
+        self.heap_seq = 0
+
+
+def _const_repr(const: Any) -> str:
+    """
+    repr() of a code constant that is identical in every process. Set
+    literals compile to frozensets whose repr order follows the per-process
+    str hash seed, so their members are listed sorted.
+    """
+    if inspect.iscode(const):
+        return _code_fingerprint(const)
+    if isinstance(const, frozenset):
+        return "frozenset({" + ", ".join(sorted(_const_repr(item) for item in const)) + "})"
+    if isinstance(const, tuple):
+        items = [_const_repr(item) for item in const]
+        return "(" + ", ".join(items) + ("," if len(items) == 1 else "") + ")"
+    return repr(const)
+
+
+def _code_fingerprint(code) -> str:
+    """
+    Hashes a code object (including nested functions/lambdas) so persisted
+    results are dropped automatically once the function body changes.
+    The hash is stable across processes and restarts.
+    """
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        digest.update(_const_repr(const).encode())
+    return digest.hexdigest()[:16]
+
+
+def _function_namespace(func: Callable) -> str:
+    """Qualified name + code fingerprint: where a function's results live in cross-process tiers."""
+    code = getattr(inspect.unwrap(func), "__code__", None)
+    version = _code_fingerprint(code) if code is not None else "nocode"
+    return f"{func.__qualname__}:{version}"
+
+
+class DiskCache:
+    """
+    sqlite-backed second tier for ResultCache.
+    Entries are pickled and stored under a namespace made of the function's
+    qualified name and code fingerprint, so results survive restarts and
+    are shared by every process on the host that points at the same file.
+    Every invalidation and clear() bumps a generation row, which lets set()
+    refuse a value computed before another process invalidated it.
+
+    The file is kept bounded: expired rows are deleted when read and swept
+    every `_SWEEP_EVERY` writes, the namespace is trimmed to its newest
+    `max_rows` entries, and for_function() drops the rows of other code
+    versions of the same function.
+    """
+
+    tier_name = "disk"
+    _SWEEP_EVERY = 256
+
+    def __init__(self, path: str, namespace: str, max_rows: Optional[int] = 100_000):
+        self.path = path
+        self.namespace = namespace
+        self.max_rows = max_rows
+        self._local = threading.local()  # sqlite connections are per-thread
+        self._writes = itertools.count(1)
+        _SHARED_TIERS.add(self)
+
+    @classmethod
+    def for_function(cls, path: str, func: Callable, max_rows: Optional[int] = 100_000) -> "DiskCache":
+        cache = cls(path, _function_namespace(func), max_rows)
+        cache._drop_other_versions(f"{func.__qualname__}:")
+        return cache
+
+    def _drop_other_versions(self, prefix: str) -> None:
+        """Deletes rows left by earlier code versions (namespaces with the same qualname prefix)."""
+        conn = self._conn()
+        stale = "substr(namespace, 1, ?) = ? AND namespace != ?"
+        args = (len(prefix), prefix, self.namespace)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("results", "result_tags", "generations"):
+                conn.execute(f"DELETE FROM {table} WHERE {stale}", args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _sweep(self, conn: sqlite3.Connection) -> None:
+        """Deletes expired rows and trims the namespace to max_rows (oldest writes first)."""
+        conn.execute("DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        if self.max_rows is not None:
+            conn.execute(
+                "DELETE FROM results WHERE namespace = ? AND rowid IN (SELECT rowid FROM results"
+                " WHERE namespace = ? ORDER BY rowid DESC LIMIT -1 OFFSET ?)",  # INSERT OR REPLACE renews rowid
+                (self.namespace, self.namespace, self.max_rows),
+            )
+        conn.execute(
+            "DELETE FROM result_tags WHERE NOT EXISTS (SELECT 1 FROM results"
+            " WHERE results.namespace = result_tags.namespace AND results.key = result_tags.key)"
+        )
+
+    def _delete(self, conn: sqlite3.Connection, digest: bytes) -> None:
+        conn.execute("DELETE FROM results WHERE namespace = ? AND key = ?", (self.namespace, digest))
+        conn.execute("DELETE FROM result_tags WHERE namespace = ? AND key = ?", (self.namespace, digest))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " namespace TEXT NOT NULL, key BLOB NOT NULL, value BLOB NOT NULL,"
+                " expires_at REAL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_tags ("
+                " namespace TEXT NOT NULL, key BLOB NOT NULL, tag TEXT NOT NULL, tag_blob BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS result_tags_by_tag ON result_tags (namespace, tag)")
+            conn.execute("CREATE INDEX IF NOT EXISTS result_tags_by_key ON result_tags (namespace, key)")
+            # tag is repr(tag), or "" for the namespace itself (bumped by clear())
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                " namespace TEXT NOT NULL, tag TEXT NOT NULL, generation INTEGER NOT NULL,"
+                " PRIMARY KEY (namespace, tag))"
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _digest(key: Hashable) -> Optional[bytes]:
+        try:
+            return hashlib.sha256(pickle.dumps(key, protocol=4)).digest()
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None  # Key can't be persisted; memory tier only
+
+    def get(self, key: Hashable) -> Any:
+        """Returns (value, tags) or _MISSING."""
+        digest = self._digest(key)
+        if digest is None:
+            return _MISSING
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM results WHERE namespace = ? AND key = ?",
+            (self.namespace, digest),
+        ).fetchone()
+        if row is None:
+            return _MISSING
+        blob, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self._delete(conn, digest)
+            return _MISSING
+        try:
+            value = pickle.loads(blob)
+            tags = tuple(pickle.loads(tag_blob) for (tag_blob,) in conn.execute(
+                "SELECT tag_blob FROM result_tags WHERE namespace = ? AND key = ?", (self.namespace, digest)))
+        except Exception as e:
+            logger.warning(f"DISK CACHE: Discarding unreadable entry in {self.namespace}: {e}")
+            self._delete(conn, digest)
+            return _MISSING
+        return value, tags
+
+    def _generations(self, conn: sqlite3.Connection, tags: Iterable[Hashable]) -> Tuple[int, ...]:
+        names = [""] + [repr(tag) for tag in tags]
+        rows = dict(conn.execute(
+            f"SELECT tag, generation FROM generations WHERE namespace = ? AND tag IN ({', '.join('?' * len(names))})",
+            (self.namespace, *names)))
+        return tuple(rows.get(name, 0) for name in names)
+
+    def _bump(self, conn: sqlite3.Connection, tag: str) -> None:
+        conn.execute(
+            "INSERT INTO generations VALUES (?, ?, 1)"
+            " ON CONFLICT (namespace, tag) DO UPDATE SET generation = generation + 1",
+            (self.namespace, tag),
+        )
+
+    def snapshot(self, tags: Iterable[Hashable] = ()) -> Tuple[int, ...]:
+        """The generations a computation starts from; pass to set() to drop it if they move."""
+        return self._generations(self._conn(), tags)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[Hashable] = (),
+            snapshot: Optional[Tuple[int, ...]] = None) -> None:
+        digest = self._digest(key)
+        if digest is None:
+            return
+        tags = tuple(tags)
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            tag_rows = [(self.namespace, digest, repr(tag), pickle.dumps(tag, protocol=4)) for tag in tags]
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if snapshot is not None and self._generations(conn, tags) != snapshot:
+                conn.execute("ROLLBACK")  # Invalidated while it was being computed
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO results (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, digest, blob, expires_at),
+            )
+            conn.execute("DELETE FROM result_tags WHERE namespace = ? AND key = ?", (self.namespace, digest))
+            conn.executemany("INSERT INTO result_tags VALUES (?, ?, ?, ?)", tag_rows)
+            if next(self._writes) % self._SWEEP_EVERY == 0:
+                self._sweep(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """Deletes the persisted entries carrying `tag`, so other processes see the invalidation too."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM results WHERE namespace = ? AND key IN "
+                "(SELECT key FROM result_tags WHERE namespace = ? AND tag = ?)",
+                (self.namespace, self.namespace, repr(tag)),
+            )
+            conn.execute("DELETE FROM result_tags WHERE namespace = ? AND tag = ?", (self.namespace, repr(tag)))
+            self._bump(conn, repr(tag))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM results WHERE namespace = ?", (self.namespace,))
+            conn.execute("DELETE FROM result_tags WHERE namespace = ?", (self.namespace,))
+            self._bump(conn, "")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+# Paired with a namespace, the tag whose counter a namespace-scoped clear() bumps
+_NAMESPACE_TAG = "<shared-cache-namespace>"
+
+
+class SharedMemoryCache:
+    """
+    Host-wide result cache living in a multiprocessing.shared_memory segment
+    that every worker process attaches to by name.
+
+    Layout: a header (geometry + a global generation), a block of tag
+    generation counters, a fixed-size open-addressing slot table (linear
+    probing on a 128-bit key digest) and one fixed-size value slab per
+    slot. Writers are serialised with a lock file (flock) plus a thread
+    lock; readers take no lock and use a per-slot seqlock instead,
+    retrying if a write raced with them. Values that pickle to more than
+    `slab_size` bytes are simply not shared.
+
+    One segment can serve several functions: cache_result talks to it
+    through bind(namespace), which keeps each function's keys apart and
+    scopes clear() to that function.
+
+    Segments deliberately outlive the processes using them (they live in
+    RAM, e.g. /dev/shm). for_function() keeps exactly one per function
+    across deploys: a new code version empties it rather than creating
+    another. Removing a segment for good is the deployment's job: call
+    unlink() once when the function or service is retired (for segments
+    created by name, whoever chose the name owns it).
+    """
+
+    tier_name = "shared"
+
+    _MAGIC = b"DCSHM001"
+    _HEADER = struct.Struct("<8sQQQ")  # magic, slots, slab_size, generation
+    _HEADER_SIZE = 64
+    _VERSION = struct.Struct("<16s")  # Code version of the owning function, after _HEADER
+    _TAG_COUNTERS = 1024
+    _COUNTER = struct.Struct("<Q")
+    _SLOT = struct.Struct("<QB7x16sdQI4x")  # seq, state, digest, expires_at, generation, length
+    _EMPTY, _USED = 0, 1
+    _MAX_PROBE = 16
+    _READ_RETRIES = 8
+
+    def __init__(self, name: str, slots: int = 4096, slab_size: int = 4096):
+        self.name = name
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=self._layout_size(slots, slab_size))
+            self._HEADER.pack_into(self._shm.buf, 0, b"\0" * 8, slots, slab_size, 0)
+            self._shm.buf[:8] = self._MAGIC  # Published last: attachers wait for it
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+            deadline = time.monotonic() + 5
+            while bytes(self._shm.buf[:8]) != self._MAGIC:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Shared cache segment {name!r} was never initialised")
+                time.sleep(0.001)
+        # The segment outlives any single worker; don't let this process's
+        # resource tracker unlink it at exit (call unlink() explicitly instead)
+        try:
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        except Exception:
+            pass
+
+        _, self.slots, self.slab_size, _ = self._HEADER.unpack_from(self._shm.buf, 0)
+        self._counters_offset = self._HEADER_SIZE
+        self._table_offset = self._counters_offset + self._TAG_COUNTERS * self._COUNTER.size
+        self._slab_offset = self._table_offset + self.slots * self._SLOT.size
+        self._thread_lock = threading.Lock()
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self.closed = False
+        _SHARED_TIERS.add(self)
+
+    @classmethod
+    def _layout_size(cls, slots: int, slab_size: int) -> int:
+        return (cls._HEADER_SIZE + cls._TAG_COUNTERS * cls._COUNTER.size
+                + slots * (cls._SLOT.size + slab_size))
+
+    @classmethod
+    def for_function(cls, func: Callable, slots: int = 4096, slab_size: int = 4096) -> "SharedMemoryCache":
+        """
+        The segment of one function, named after its qualname only. If it was
+        last used by another version of the code, it is emptied and re-tagged,
+        so each deploy reuses the segment instead of leaving a new one behind.
+        """
+        namespace = _function_namespace(func)
+        digest = hashlib.sha256(f"{func.__module__}.{func.__qualname__}".encode()).hexdigest()[:16]
+        segment = cls(f"dcache-{digest}", slots, slab_size)
+        segment._adopt_version(hashlib.sha256(namespace.encode()).digest()[:16])
+        return segment
+
+    def _adopt_version(self, version: bytes) -> None:
+        offset = self._HEADER.size
+        if self._VERSION.unpack_from(self._shm.buf, offset)[0] == version:
+            return
+        with self._writer():
+            if self._VERSION.unpack_from(self._shm.buf, offset)[0] != version:
+                self._bump_generation()  # Old version's entries are unreachable anyway; free their slots
+                self._VERSION.pack_into(self._shm.buf, offset, version)
+
+    def bind(self, namespace: str) -> "_SharedNamespace":
+        """The tier one function should use: keys and clear() scoped to `namespace`."""
+        return _SharedNamespace(self, namespace)
+
+    @contextlib.contextmanager
+    def _writer(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _generation(self) -> int:
+        return self._HEADER.unpack_from(self._shm.buf, 0)[3]
+
+    def _counter_offset(self, tag: Hashable) -> int:
+        index = int.from_bytes(hashlib.sha256(repr(tag).encode()).digest()[:8], "little") % self._TAG_COUNTERS
+        return self._counters_offset + index * self._COUNTER.size
+
+    def _slot_offset(self, index: int) -> int:
+        return self._table_offset + index * self._SLOT.size
+
+    def _probe(self, digest: bytes):
+        home = int.from_bytes(digest[:8], "little") % self.slots
+        for step in range(min(self._MAX_PROBE, self.slots)):
+            yield (home + step) % self.slots
+
+    @staticmethod
+    def _key_digest(namespace: str, key: Hashable) -> Optional[bytes]:
+        try:
+            blob = pickle.dumps(key, protocol=4)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None  # Key can't be shared; memory tier only
+        return hashlib.sha256(namespace.encode() + b"\0" + blob).digest()[:16]
+
+    def get(self, key: Hashable, namespace: str = "") -> Any:
+        """Returns (value, tags) or _MISSING."""
+        if self.closed:
+            return _MISSING
+        digest = self._key_digest(namespace, key)
+        if digest is None:
+            return _MISSING
+        buf = self._shm.buf
+        for index in self._probe(digest):
+            offset = self._slot_offset(index)
+            for _ in range(self._READ_RETRIES):
+                seq, state, slot_digest, expires_at, generation, length = self._SLOT.unpack_from(buf, offset)
+                if seq & 1:
+                    continue  # Write in progress
+                if state == self._EMPTY:
+                    return _MISSING
+                blob = None
+                if slot_digest == digest:
+                    start = self._slab_offset + index * self.slab_size
+                    blob = bytes(buf[start:start + length])
+                if self._COUNTER.unpack_from(buf, offset)[0] != seq:
+                    continue  # Torn read; try again
+                break
+            else:
+                return _MISSING  # Too much write contention; treat as a miss
+            if blob is None:
+                continue
+            if generation != self._generation() or (expires_at and expires_at <= time.time()):
+                return _MISSING
+            try:
+                value, tags, tag_versions = pickle.loads(blob)
+            except Exception:
+                return _MISSING
+            for counter_offset, version in tag_versions:
+                if self._COUNTER.unpack_from(buf, counter_offset)[0] != version:
+                    return _MISSING
+            return value, tags
+        return _MISSING
+
+    def snapshot(self, tags: Iterable[Hashable] = (), namespace: str = "") -> tuple:
+        """
+        The segment generation and counter values a computation starts from.
+        Pass it to set() to drop the value if any of them moved meanwhile.
+        """
+        if self.closed:
+            return 0, ()
+        buf = self._shm.buf
+        tag_versions = []
+        # The namespace's own counter is what a scoped clear() bumps
+        for tag in ((_NAMESPACE_TAG, namespace),) + tuple(tags):
+            counter_offset = self._counter_offset(tag)
+            tag_versions.append((counter_offset, self._COUNTER.unpack_from(buf, counter_offset)[0]))
+        return self._generation(), tuple(tag_versions)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[Hashable] = (),
+            namespace: str = "", snapshot: Optional[tuple] = None) -> None:
+        if self.closed:
+            return
+        digest = self._key_digest(namespace, key)
+        if digest is None:
+            return
+        tags = tuple(tags)
+        buf = self._shm.buf
+        with self._writer():
+            current = self.snapshot(tags, namespace)
+            if snapshot is not None and snapshot != current:
+                return  # Invalidated (here or in another process) while it was being computed
+            _, tag_versions = current
+            try:
+                blob = pickle.dumps((value, tags, tag_versions), protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return
+            if len(blob) > self.slab_size:
+                return
+
+            # Our own slot if the key is already stored, else the first free one:
+            # never used, left over from before clear(), or expired
+            target = free = None
+            current_generation = self._generation()
+            now = time.time()
+            for index in self._probe(digest):
+                _, state, slot_digest, slot_expires, slot_generation, _ = self._SLOT.unpack_from(
+                    buf, self._slot_offset(index))
+                if state == self._EMPTY:
+                    if free is None:
+                        free = index
+                    break  # Readers stop here too, so the key can't be further on
+                if slot_digest == digest:
+                    target = index
+                    break
+                if free is None and (slot_generation != current_generation
+                                     or (slot_expires and slot_expires <= now)):
+                    free = index
+            if target is None:
+                target = free if free is not None else next(self._probe(digest))  # Window full: evict home
+
+            offset = self._slot_offset(target)
+            seq = self._COUNTER.unpack_from(buf, offset)[0]
+            self._COUNTER.pack_into(buf, offset, seq + 1)  # Odd: readers back off
+            start = self._slab_offset + target * self.slab_size
+            buf[start:start + len(blob)] = blob
+            expires_at = now + ttl if ttl is not None else 0.0
+            self._SLOT.pack_into(buf, offset, seq + 1, self._USED, digest, expires_at,
+                                 current_generation, len(blob))
+            self._COUNTER.pack_into(buf, offset, seq + 2)  # Even again only once the slot is complete
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        if self.closed:
+            return
+        offset = self._counter_offset(tag)
+        with self._writer():
+            self._COUNTER.pack_into(self._shm.buf, offset, self._COUNTER.unpack_from(self._shm.buf, offset)[0] + 1)
+
+    def clear(self) -> None:
+        """O(1): bumps the segment generation so every existing entry reads as a miss."""
+        if self.closed:
+            return
+        with self._writer():
+            self._bump_generation()
+
+    def _bump_generation(self) -> None:
+        """Caller holds the writer lock."""
+        magic, slots, slab_size, generation = self._HEADER.unpack_from(self._shm.buf, 0)
+        self._HEADER.pack_into(self._shm.buf, 0, magic, slots, slab_size, generation + 1)
+
+    def close(self) -> None:
+        """Detaches this process; afterwards every operation is a no-op (get() misses)."""
+        if self.closed:
+            return
+        self.closed = True
+        _SHARED_TIERS.discard(self)
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Destroys the segment for every process (call once, e.g. at deploy teardown)."""
+        self.close()
+        try:
+            resource_tracker.register(self._shm._name, "shared_memory")  # unlink() unregisters it again
+        except Exception:
+            pass
+        self._shm.unlink()
+
+
+class _SharedNamespace:
+    """
+    One function's view of a SharedMemoryCache (see SharedMemoryCache.bind).
+    Its keys never collide with other namespaces in the same segment, and
+    clear() only drops its own entries.
+    """
+
+    tier_name = "shared"
+
+    def __init__(self, segment: SharedMemoryCache, namespace: str):
+        self.segment = segment
+        self.namespace = namespace
+
+    def get(self, key: Hashable) -> Any:
+        return self.segment.get(key, self.namespace)
+
+    def snapshot(self, tags: Iterable[Hashable] = ()) -> tuple:
+        return self.segment.snapshot(tags, self.namespace)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[Hashable] = (),
+            snapshot: Optional[tuple] = None) -> None:
+        self.segment.set(key, value, ttl, tags, self.namespace, snapshot)
+
+    def clear(self) -> None:
+        self.segment.invalidate_tag((_NAMESPACE_TAG, self.namespace))
+
+
+def _shared_tier(func: Callable, shared: Union[bool, SharedMemoryCache, None]) -> Optional[_SharedNamespace]:
+    """cache_result's `shared` option: True for a segment of func's own, or an existing segment."""
+    if not shared:
+        return None
+    segment = SharedMemoryCache.for_function(func) if shared is True else shared
+    return segment.bind(_function_namespace(func))
+
+
+class ResultCache:
+    """
+    Bounded, thread-safe store used by cache_result.
+    Keeps at most `maxsize` entries (None = unbounded), evicting the
+    least-recently-used one first, and expires entries after `ttl` seconds.
+
+    With a `max_bytes` budget each value is measured by `sizer` and
+    eviction switches to GDSF (Greedy-Dual-Size-Frequency): entries are
+    ranked by frequency * recompute cost / size, so cheap-to-rebuild large
+    values go first and expensive small ones stay.
+
+    Optional `shared` (a bound SharedMemoryCache) and `backing` (DiskCache) tiers
+    are consulted lazily, in that order, on memory misses.
+    Entries stored with tags go stale when any of them is invalidate()d,
+    and invalidate_all() drops everything in O(1) by bumping `generation`.
+    A miss that ends up waiting for another caller's computation
+    (single-flight) is counted as `coalesced` instead of as a miss, so
+    `misses` is the number of times the function actually had to run.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 128, ttl: Optional[float] = None,
+                 backing: Optional[DiskCache] = None, shared: Optional[_SharedNamespace] = None,
+                 max_bytes: Optional[int] = None, sizer: Callable[[Any], int] = estimate_size):
+        if maxsize is not None and maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer or None")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer or None")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backing = backing
+        self.shared = shared
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self._tiers = [tier for tier in (shared, backing) if tier is not None]
+        self.generation = 0
+        self._data: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.tier_hits = {tier.tier_name: 0 for tier in self._tiers}
+        self.current_bytes = 0
+        # GDSF state: (priority, seq, key) min-heap with lazy deletion, and the inflation clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._heap_seq = itertools.count(1)
+        self._clock = 0.0
+        self._cost_total = 0.0
+        self._cost_samples = 0
+
+    def _is_fresh(self, entry: _CacheEntry) -> bool:
+        if entry.generation != self.generation:
+            return False
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            return False
+        if entry.tags:
+            generations = _TAG_GENERATIONS
+            for tag, generation in entry.tags:
+                if generations.get(tag, 0) != generation:
+                    return False
+        return True
+
+    def _prioritize(self, key: Hashable, entry: _CacheEntry) -> None:
+        """(Re)queues an entry under its GDSF priority. Caller holds the lock."""
+        priority = self._clock + entry.frequency * entry.cost / max(entry.size, 1)
+        entry.heap_seq = next(self._heap_seq)
+        heapq.heappush(self._heap, (priority, entry.heap_seq, key))
+        if len(self._heap) > 4 * len(self._data) + 64:  # Drop superseded heap items
+            self._heap = [item for item in self._heap
+                          if (e := self._data.get(item[2])) is not None and e.heap_seq == item[1]]
+            heapq.heapify(self._heap)
+
+    def _discard(self, key: Hashable) -> Optional[_CacheEntry]:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+        return entry
+
+    def _evict_one(self) -> None:
+        """Removes the LRU entry, or the lowest-priority one under a byte budget. Caller holds the lock."""
+        if self.max_bytes is None:
+            _, entry = self._data.popitem(last=False)
+            self.current_bytes -= entry.size
+        else:
+            while True:
+                priority, seq, key = heapq.heappop(self._heap)
+                entry = self._data.get(key)
+                if entry is not None and entry.heap_seq == seq:
+                    break
+            self._clock = priority  # Inflation: survivors age relative to what was evicted
+            self._discard(key)
+        self.evictions += 1
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value, or _MISSING if absent, expired or invalidated."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if self._is_fresh(entry):
+                    self._data.move_to_end(key)
+                    if self.max_bytes is not None:
+                        entry.frequency += 1
+                        self._prioritize(key, entry)
+                    self.hits += 1
+                    return entry.value
+                self._discard(key)
+                if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                    self.evictions += 1
+                else:
+                    self.invalidations += 1
+
+        for depth, tier in enumerate(self._tiers):
+            found = tier.get(key)
+            if found is not _MISSING:
+                value, tags = found
+                self._store(key, value, tags)
+                for faster in self._tiers[:depth]:  # e.g. a disk hit warms shared memory
+                    faster.set(key, value, self.ttl, tags)
+                with self._lock:
+                    self.hits += 1
+                    self.tier_hits[tier.tier_name] += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return _MISSING
+
+    def peek(self, key: Hashable) -> Any:
+        """Like get(), but leaves counters and LRU order untouched."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or not self._is_fresh(entry):
+                return _MISSING
+            return entry.value
+
+    def _store(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (), cost: Optional[float] = None,
+               snapshot: Optional[tuple] = None) -> None:
+        if snapshot is None:
+            generation, tag_generations = self.generation, _snapshot_tags(tags)
+        else:
+            generation, _, tag_generations, _ = snapshot
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        size = self.sizer(value) if self.max_bytes is not None else 0  # Sizing is skipped without a budget
+        with self._lock:
+            previous = self._discard(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # Would evict everything else; leave it to the slower tiers
+
+            if cost is None:  # e.g. promoted from disk: assume an average recompute
+                cost = self._cost_total / self._cost_samples if self._cost_samples else 1.0
+            else:
+                self._cost_total += cost
+                self._cost_samples += 1
+
+            entry = _CacheEntry(value, expires_at, generation, tag_generations, size, cost)
+            self._data[key] = entry
+            self.current_bytes += size
+            if self.max_bytes is not None:
+                if previous is not None:
+                    entry.frequency = previous.frequency + 1
+                self._prioritize(key, entry)
+
+            while self._data and (
+                    (self.maxsize is not None and len(self._data) > self.maxsize)
+                    or (self.max_bytes is not None and self.current_bytes > self.max_bytes)):
+                self._evict_one()
+
+    def snapshot(self, tags: Iterable[Hashable] = ()) -> tuple:
+        """
+        Captures the cache and tag generations a computation starts from,
+        in this process and in every cross-process tier. Take it *before*
+        computing and pass it to set(), so that an invalidation racing with
+        the computation (here or in another worker) is not lost.
+        """
+        tags = tuple(tags)
+        return (self.generation, tags, _snapshot_tags(tags),
+                tuple(tier.snapshot(tags) for tier in self._tiers))
+
+    def _is_current(self, snapshot: tuple) -> bool:
+        generation, _, tag_generations, _ = snapshot
+        generations = _TAG_GENERATIONS
+        return generation == self.generation and all(
+            generations.get(tag, 0) == tag_generation for tag, tag_generation in tag_generations)
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (), cost: Optional[float] = None,
+            snapshot: Optional[tuple] = None) -> None:
+        """
+        Stores a value; `cost` is how long it took to compute (seconds), used
+        by GDSF. With a `snapshot` (see snapshot()) its tags are used, and a
+        value computed before an invalidation is not stored at all.
+        """
+        if snapshot is None:
+            tags = tuple(tags)
+            tier_snapshots = (None,) * len(self._tiers)
+        elif not self._is_current(snapshot):
+            with self._lock:
+                self.invalidations += 1
+            return
+        else:
+            tags, tier_snapshots = snapshot[1], snapshot[3]
+        self._store(key, value, tags, cost, snapshot)
+        for tier, tier_snapshot in zip(self._tiers, tier_snapshots):
+            tier.set(key, value, self.ttl, tags, snapshot=tier_snapshot)  # Skipped if invalidated elsewhere
+
+    def invalidate_all(self) -> None:
+        """O(1): entries from older generations are treated as misses and dropped lazily."""
+        with self._lock:
+            self.generation += 1
+        for tier in self._tiers:
+            tier.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._heap.clear()
+            self.current_bytes = 0
+        for tier in self._tiers:
+            tier.clear()
+
+    def record_coalesced(self) -> None:
+        """Reclassifies the miss just counted by get() as a wait on another caller's computation."""
+        with self._lock:
+            self.misses -= 1
+            self.coalesced += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self.coalesced,
+                **{f"{name}_hits": count for name, count in self.tier_hits.items()},
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _SingleFlight:
+    """
+    Coalesces concurrent computations of the same key into a single call.
+    The first caller (the leader) runs the computation; everyone arriving
+    while it is in flight waits for and shares its result or exception.
+    `on_follow` is called once for each caller that ends up waiting.
+    """
+
+    def __init__(self, on_follow: Optional[Callable[[], None]] = None):
+        self._on_follow = on_follow
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Flight] = {}
+        # In-flight tasks per event loop (e.g. warm_up() replays on a loop of its
+        # own). Each loop's dict is only touched from that loop's thread.
+        self._async_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = \
+            weakref.WeakKeyDictionary()
+
+    def join(self, key: Hashable) -> Tuple[bool, _Flight]:
+        """Returns (True, new flight) for the leader, or (False, flight in progress)."""
+        with self._lock:
+            flight = self._calls.get(key)
+            if flight is None:
+                flight = self._calls[key] = _Flight()
+                return True, flight
+        if self._on_follow is not None:
+            self._on_follow()
+        return False, flight
+
+    def finish(self, key: Hashable, flight: _Flight, result: Any = None,
+               error: Optional[BaseException] = None) -> None:
+        """Called once by the leader: publishes the outcome and wakes every waiter."""
+        flight.result = result
+        flight.error = error
+        with self._lock:
+            del self._calls[key]
+        flight.event.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        leader, flight = self.join(key)
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        The computation runs in its own task that every caller awaits through
+        shield(), so cancelling any caller (the first one included) never
+        cancels the others; the task finishes even if all callers give up.
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.get(loop)
+        if calls is None:
+            with self._lock:  # Loops in other threads may be registering too
+                calls = self._async_calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            task = loop.create_task(fn())
+            calls[key] = task
+
+            def finished(done: "asyncio.Future") -> None:
+                if calls.get(key) is done:
+                    del calls[key]
+                if not done.cancelled():
+                    done.exception()  # Mark as retrieved when every caller was cancelled
+
+            task.add_done_callback(finished)
+        elif self._on_follow is not None:
+            self._on_follow()
+        return await asyncio.shield(task)
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency estimator: `depth` rows of `width` counters.
+    Estimates never undercount, and overcount by at most ~e/width of the
+    total with probability 1 - e^-depth.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [array("L", bytes(array("L").itemsize * width)) for _ in range(depth)]
+
+    def add(self, item: Hashable) -> int:
+        """Counts one occurrence and returns the new estimate."""
+        # Double hashing: one hash() call yields all `depth` row positions
+        position = hash(item)
+        step = ((position >> 17) ^ (position * 0x9E3779B1)) | 1
+        width = self.width
+        estimate = None
+        for row in self._rows:
+            index = position % width
+            count = row[index] = row[index] + 1
+            if estimate is None or count < estimate:
+                estimate = count
+            position += step
+        return estimate
+
+
+class _HotKeys:
+    """
+    Tracks the top-K most frequently requested argument tuples of a cached
+    function, using a CountMinSketch for counts and a K-sized candidate set.
+    The coldest candidate is found through a min-heap whose entries may lag
+    behind (estimates only grow) and are refreshed lazily, so recording a
+    call is O(log K) instead of a scan of all candidates.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._sketch = CountMinSketch()
+        self._lock = threading.Lock()
+        self._top: Dict[Hashable, List[Any]] = {}  # key -> [estimate, args, kwargs]
+        self._heap: List[Tuple[int, int, Hashable]] = []  # One (estimate, seq, key) per candidate
+        self._seq = itertools.count()
+
+    def _coldest(self) -> Tuple[int, Hashable]:
+        """Current (estimate, key) of the least requested candidate. Caller holds the lock."""
+        heap = self._heap
+        while True:
+            estimate, seq, key = heap[0]
+            current = self._top[key][0]
+            if current == estimate:
+                return estimate, key
+            heapq.heapreplace(heap, (current, seq, key))  # Stale entry: re-queue at its real count
+
+    def record(self, key: Hashable, args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            estimate = self._sketch.add(key)
+            candidate = self._top.get(key)
+            if candidate is not None:
+                candidate[0] = estimate  # Its heap entry is refreshed lazily by _coldest()
+            elif len(self._top) < self.k:
+                self._top[key] = [estimate, args, kwargs]
+                heapq.heappush(self._heap, (estimate, next(self._seq), key))
+            else:
+                coldest_estimate, coldest = self._coldest()
+                if estimate > coldest_estimate:
+                    del self._top[coldest]
+                    self._top[key] = [estimate, args, kwargs]
+                    heapq.heapreplace(self._heap, (estimate, next(self._seq), key))
+
+    def save(self, path: str) -> int:
+        """Writes the hot calls, hottest first; returns how many could be pickled."""
+        with self._lock:
+            ranked = sorted(self._top.values(), key=lambda c: c[0], reverse=True)
+        records = []
+        for estimate, args, kwargs in ranked:
+            try:
+                records.append(pickle.dumps((estimate, args, kwargs), protocol=4))
+            except (pickle.PicklingError, TypeError, AttributeError):
+                continue
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(records, f, protocol=4)
+        os.replace(tmp_path, path)  # Never leave a half-written file for the next start
+        return len(records)
+
+
+def _load_hot_calls(path: str, limit: Optional[int]) -> List[Tuple[tuple, dict]]:
+    with open(path, "rb") as f:
+        records = pickle.load(f)
+    calls = []
+    for blob in records[:limit]:
+        try:
+            _, args, kwargs = pickle.loads(blob)
+        except Exception:
+            continue  # e.g. the argument's class no longer exists
+        calls.append((args, kwargs))
+    return calls
+
+
+def _warm_up(wrapper: Callable, path: str, max_workers: int, limit: Optional[int]) -> threading.Thread:
+    """
+    Replays recorded hot calls through `wrapper` from a background thread,
+    at most `max_workers` at a time, in the caller's context (so the same
+    user/role applies). Returns the started thread.
+    """
+    context = contextvars.copy_context()
+
+    def replay_sync(calls):
+        def call(args, kwargs):
+            try:
+                context.copy().run(wrapper, *args, **kwargs)
+            except Exception as e:
+                logger.warning(f"WARM-UP: {wrapper.__name__} failed for a recorded call: {e}")
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-warm-up") as pool:
+            for args, kwargs in calls:
+                pool.submit(call, args, kwargs)
+
+    def replay_async(calls):
+        async def run_all():
+            limiter = asyncio.Semaphore(max_workers)
+
+            async def call(args, kwargs):
+                async with limiter:
+                    try:
+                        await wrapper(*args, **kwargs)
+                    except Exception as e:
+                        logger.warning(f"WARM-UP: {wrapper.__name__} failed for a recorded call: {e}")
+
+            await asyncio.gather(*(call(args, kwargs) for args, kwargs in calls))
+
+        context.run(asyncio.run, run_all())
+
+    def run():
+        try:
+            calls = _load_hot_calls(path, limit)
+        except FileNotFoundError:
+            return
+        started = time.perf_counter()
+        (replay_async if inspect.iscoroutinefunction(wrapper) else replay_sync)(calls)
+        logger.info(f"WARM-UP: replayed {len(calls)} hot calls of {wrapper.__name__} "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    thread = threading.Thread(target=run, name=f"warm-up-{wrapper.__name__}", daemon=True)
+    thread.start()
+    return thread
+
+
+class CacheReservation:
+    """
+    A claim on computing one call of a cache_result / compose function
+    outside its wrapper (e.g. in a process pool), keyed exactly like a real
+    call. If `leader` is False the same call is already in flight elsewhere
+    and result() waits for it; otherwise compute the value and call
+    fulfil() (or fail()) exactly once, which also releases any single-flight
+    waiters.
+    """
+
+    def __init__(self, store: "ResultCache", flights: Optional[_SingleFlight], key: Hashable, tags: tuple):
+        self._store = store
+        self._flights = flights
+        self._key = key
+        self._flight: Optional[_Flight] = None
+        self.leader = True
+        if flights is not None:
+            self.leader, self._flight = flights.join(key)
+        self._snapshot = store.snapshot(tags) if self.leader else None
+
+    def result(self) -> Any:
+        """Follower only: waits for the leader's value (or re-raises its error)."""
+        if self.leader:
+            raise RuntimeError("The leader computes the value itself; call fulfil()")
+        self._flight.event.wait()
+        if self._flight.error is not None:
+            raise self._flight.error
+        return self._flight.result
+
+    def fulfil(self, value: Any, cost: Optional[float] = None) -> None:
+        self._store.set(self._key, value, cost=cost, snapshot=self._snapshot)
+        self._finish(value, None)
+
+    def fail(self, error: BaseException) -> None:
+        self._finish(None, error)
+
+    def _finish(self, value: Any, error: Optional[BaseException]) -> None:
+        if self.leader and self._flight is not None:
+            flight, self._flight = self._flight, None  # At most once
+            self._flights.finish(self._key, flight, value, error)
+
+
+def _attach_cache_access(wrapper: Callable, store: "ResultCache", flights: Optional[_SingleFlight],
+                         tagger: Optional[Callable], hot: Optional["_HotKeys"], is_async: bool) -> None:
+    """
+    Adds cache_lookup() / cache_reserve() to a caching wrapper, for callers
+    (like batch jobs) that compute results themselves but must share the
+    wrapper's keys, hot-key tracking, single-flight and tag snapshots.
+    """
+
+    def cache_lookup(*args, **kwargs) -> Tuple[bool, Any]:
+        """Cache-only call: (True, value) on a hit, (False, None) on a miss."""
+        key = _make_key(args, kwargs)
+        if hot is not None:
+            hot.record(key, args, kwargs)
+        result = store.get(key)
+        return (False, None) if result is _MISSING else (True, result)
+
+    def cache_reserve(*args, **kwargs) -> CacheReservation:
+        # Async wrappers coordinate through asyncio tasks, which a thread can't join
+        return CacheReservation(store, None if is_async else flights, _make_key(args, kwargs),
+                                tagger(args, kwargs) if tagger else ())
+
+    wrapper.cache_lookup = cache_lookup
+    wrapper.cache_reserve = cache_reserve
+
+
+def _attach_hot_keys(wrapper: Callable, hot_keys: Optional[_HotKeys], hot_keys_path: Optional[str]) -> None:
+    """Adds save_hot_keys() / warm_up() to a caching wrapper (shared by cache_result and compose)."""
+    if hot_keys is None:
+        return
+
+    def resolve(path: Optional[str]) -> str:
+        path = path or hot_keys_path
+        if not path:
+            raise ValueError(f"{wrapper.__qualname__} has no hot_keys_path; pass a path explicitly")
+        return path
+
+    def save_hot_keys(path: Optional[str] = None) -> int:
+        return hot_keys.save(resolve(path))
+
+    def warm_up(path: Optional[str] = None, max_workers: int = 4, limit: Optional[int] = None) -> threading.Thread:
+        return _warm_up(wrapper, resolve(path), max_workers, limit)
+
+    wrapper.save_hot_keys = save_hot_keys
+    wrapper.warm_up = warm_up
+    if hot_keys_path:
+        atexit.register(save_hot_keys)
+
+
+def cache_result(func: Optional[Callable] = None, *, maxsize: Optional[int] = 128,
+                 ttl: Optional[float] = None, single_flight: bool = False,
+                 persist: Optional[str] = None,
+                 tags: Union[str, Callable[..., Iterable[Hashable]], None] = None,
+                 shared: Union[bool, SharedMemoryCache, None] = None,
+                 max_bytes: Optional[int] = None, sizer: Callable[[Any], int] = estimate_size,
+                 hot_keys: int = 0, hot_keys_path: Optional[str] = None) -> Callable:
+    """
+    Caches the result of a function call based on its arguments.
+    Useful for expensive computations.
+
+    Can be used bare (@cache_result) or configured
+    (@cache_result(maxsize=1024, ttl=300)). The wrapper exposes the
+    underlying ResultCache as `wrapper.cache` and its counters via
+    `wrapper.cache_info()`.
+
+    With single_flight=True, concurrent misses on the same key run the
+    function once and share the result (stampede protection). Coroutine
+    functions are supported: their awaited result is what gets cached.
+
+    With persist="path/to/cache.sqlite3", results are also written to a
+    DiskCache there and read back lazily on memory misses, surviving
+    restarts and warming every worker on the host.
+
+    `tags` labels each entry, either by argument name (tags="dataset_id"
+    gives the tag ("dataset_id", <value>)) or with a callable taking the
+    call's arguments. invalidate(tag) then expires matching entries
+    everywhere, and invalidate_function(func) drops all of func's entries.
+
+    shared=True (or a SharedMemoryCache) adds a host-wide shared-memory
+    tier, so one worker process's result warms every other worker. One
+    SharedMemoryCache may back several functions; their entries stay apart.
+
+    max_bytes caps the memory tier by estimated value size (see `sizer`)
+    and evicts by size versus measured recompute time (GDSF).
+
+    hot_keys=K tracks the K most requested calls; `wrapper.save_hot_keys()`
+    writes them to `hot_keys_path` (also done at exit) and, after the next
+    start, `wrapper.warm_up()` replays them in the background to
+    pre-populate the cache before traffic arrives.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        backing = DiskCache.for_function(persist, func) if persist else None
+        cache = ResultCache(maxsize=maxsize, ttl=ttl, backing=backing, shared=_shared_tier(func, shared),
+                            max_bytes=max_bytes, sizer=sizer)
+        flights = _SingleFlight(cache.record_coalesced) if single_flight else None
+        tagger = _compile_tagger(func, tags)
+        hot = _HotKeys(hot_keys) if hot_keys else None
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                key = _make_key(args, kwargs)
+                if hot is not None:
+                    hot.record(key, args, kwargs)
+
+                result = cache.get(key)
+                if result is not _MISSING:
+                    logger.info("CACHE HIT: Returning cached result for %s", func.__name__)
+                    return result
+
+                async def compute():
+                    result = cache.peek(key)
+                    if result is _MISSING:
+                        snapshot = cache.snapshot(tagger(args, kwargs) if tagger else ())
+                        start_time = time.perf_counter()
+                        result = await func(*args, **kwargs)
+                        cache.set(key, result, cost=time.perf_counter() - start_time, snapshot=snapshot)
+                        logger.info("CACHE MISS: Storing result for %s", func.__name__)
+                    return result
+
+                if flights is not None:
+                    return await flights.do_async(key, compute)
+                return await compute()
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = _make_key(args, kwargs)
+                if hot is not None:
+                    hot.record(key, args, kwargs)
+
+                result = cache.get(key)
+                if result is not _MISSING:
+                    logger.info("CACHE HIT: Returning cached result for %s", func.__name__)
+                    return result
+
+                def compute():
+                    # Re-check: a leader may have filled the entry since our miss
+                    result = cache.peek(key)
+                    if result is _MISSING:
+                        snapshot = cache.snapshot(tagger(args, kwargs) if tagger else ())
+                        start_time = time.perf_counter()
+                        result = func(*args, **kwargs)
+                        cache.set(key, result, cost=time.perf_counter() - start_time, snapshot=snapshot)
+                        logger.info("CACHE MISS: Storing result for %s", func.__name__)
+                    return result
+
+                if flights is not None:
+                    return flights.do(key, compute)
+                return compute()
+
+        wrapper.cache = cache
+        wrapper.cache_info = cache.stats
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_invalidate = cache.invalidate_all
+        _attach_cache_access(wrapper, cache, flights, tagger, hot, inspect.iscoroutinefunction(func))
+        _attach_hot_keys(wrapper, hot, hot_keys_path)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+# --- Decorator 5: Automatic Retry Logic ---
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a function whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast; once `recovery_timeout` seconds pass, up to
+    `half_open_max_calls` probe calls are let through and the first result
+    decides whether it closes again or re-opens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejections = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Reserves the right to make one call; False means fail fast."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.rejections += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probes = 0
+            if self._state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self.rejections += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def release(self) -> None:
+        """
+        Ends a call that neither proved nor disproved the dependency's health
+        (a non-retryable error, cancellation): frees its half-open probe slot
+        and leaves the consecutive-failure count alone.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"CIRCUIT OPEN after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class _RetryPolicy:
+    """Shared attempt/backoff bookkeeping for the sync and async retry wrappers."""
+
+    def __init__(self, name: str, max_retries: int, delay: float, backoff: float, max_delay: float,
+                 jitter: bool, deadline: Optional[float], retry_on: Tuple[type, ...],
+                 breaker: Optional[CircuitBreaker]):
+        self.name = name
+        self.max_retries = max_retries
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.breaker = breaker
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "circuit_rejections": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self.stats[field] += 1
+
+    def before_attempt(self, last_error: Optional[BaseException]) -> None:
+        if self.breaker is not None and not self.breaker.allow():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(f"Circuit open for {self.name}; failing fast") from last_error
+        self._count("attempts")
+
+    def after_success(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def after_abort(self) -> None:
+        """The attempt ended by a BaseException (e.g. cancellation): just free the breaker slot."""
+        if self.breaker is not None:
+            self.breaker.release()
+
+    def after_failure(self, error: BaseException, attempts: int, started: float) -> Optional[float]:
+        """Returns how long to sleep before the next attempt, or None to give up."""
+        if not isinstance(error, self.retry_on):
+            # Not a sign of an unhealthy dependency (e.g. bad input): neither counts
+            # towards opening the circuit nor resets the failure streak
+            if self.breaker is not None:
+                self.breaker.release()
+            self._count("failures")
+            return None
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+        logger.warning(f"Attempt {attempts}/{self.max_retries} failed for {self.name}: {error}")
+        if attempts >= self.max_retries:
+            logger.error(f"All {self.max_retries} attempts failed.")
+            self._count("failures")
+            return None
+
+        # Exponential backoff with "full jitter": sleep uniformly in [0, cap]
+        cap = min(self.max_delay, self.delay * (self.backoff ** (attempts - 1)))
+        pause = random.uniform(0, cap) if self.jitter else cap
+        if self.deadline is not None and time.monotonic() + pause - started >= self.deadline:
+            logger.error(f"Retry deadline of {self.deadline}s exhausted for {self.name}.")
+            self._count("failures")
+            return None
+
+        self._count("retries")
+        return pause
+
+
+def retry(max_retries: int = 3, delay: float = 1.0, *, backoff: float = 2.0, max_delay: float = 30.0,
+          jitter: bool = True, deadline: Optional[float] = None,
+          retry_on: Tuple[type, ...] = (Exception,),
+          circuit_breaker: Union[bool, CircuitBreaker, None] = None) -> Callable:
+    """
+    Retries the execution of a function if it fails with one of `retry_on`.
+
+    Waits grow exponentially from `delay` (capped at `max_delay`) with full
+    jitter, and retrying stops once `deadline` seconds have been spent.
+    circuit_breaker=True gives the function its own CircuitBreaker (or pass
+    a shared one) so calls fail fast with CircuitOpenError while it is open.
+    Coroutine functions are retried with asyncio.sleep. Counters are
+    available via `wrapper.retry_stats`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        breaker = CircuitBreaker() if circuit_breaker is True else (circuit_breaker or None)
+        policy = _RetryPolicy(func.__name__, max_retries, delay, backoff, max_delay, jitter,
+                              deadline, tuple(retry_on), breaker)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                policy._count("calls")
+                started = time.monotonic()
+                attempts = 0
+                last_error = None
+                while True:
+                    policy.before_attempt(last_error)
+                    attempts += 1
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        pause = policy.after_failure(e, attempts, started)
+                        if pause is None:
+                            raise
+                        last_error = e
+                        await asyncio.sleep(pause)
+                    except BaseException:
+                        policy.after_abort()
+                        raise
+                    else:
+                        policy.after_success()
+                        return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                policy._count("calls")
+                started = time.monotonic()
+                attempts = 0
+                last_error = None
+                while True:
+                    policy.before_attempt(last_error)
+                    attempts += 1
+                    try:
+                        result = func(*args, **kwargs)
+                    except Exception as e:
+                        pause = policy.after_failure(e, attempts, started)
+                        if pause is None:
+                            raise
+                        last_error = e
+                        time.sleep(pause)
+                    except BaseException:
+                        policy.after_abort()
+                        raise
+                    else:
+                        policy.after_success()
+                        return result
+
+        wrapper.retry_stats = policy.stats
+        wrapper.circuit_breaker = breaker
+        return wrapper
+
+    return decorator
+
+
+# --- Decorator 6: Type Validator (Introspection) ---
+_Check = Callable[[Any], bool]
+_UNION_TYPES = (Union, getattr(types, "UnionType", Union))  # X | Y is Python 3.10+
+
+
+def _type_name(tp: Any) -> str:
+    if isinstance(tp, type):
+        return tp.__name__
+    return repr(tp).replace("typing.", "")
+
+
+def _sampled(items: Collection, sample_size: Optional[int]):
+    """Yields every element, or only `sample_size` of them for large containers."""
+    if sample_size is None or len(items) <= sample_size:
+        return items
+    if isinstance(items, (list, tuple)):
+        return (items[i] for i in random.sample(range(len(items)), sample_size))
+    return islice(items, sample_size)
+
+
+def _compile_check(tp: Any, sample_size: Optional[int]) -> Optional[_Check]:
+    """
+    Turns a type hint into a predicate once, at decoration time.
+    Returns None when the hint accepts anything.
+    """
+    if tp is Any or tp is inspect.Parameter.empty:
+        return None
+    if tp is None or tp is type(None):
+        return lambda value: value is None
+
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+
+    if origin in _UNION_TYPES:
+        checks = [_compile_check(arg, sample_size) for arg in args]
+        if any(check is None for check in checks):
+            return None
+        return lambda value: any(check(value) for check in checks)
+
+    if origin is typing.Literal:
+        return lambda value: value in args
+
+    if origin is None:
+        if isinstance(tp, type):
+            return lambda value: isinstance(value, tp)
+        return None  # TypeVars, string forward references, ...
 
-# Global Context (simulating a logged-in session)
-CURRENT_USER = None
+    if not isinstance(origin, type):
+        return None  # Other special forms are not enforced
 
+    if not args:
+        return lambda value: isinstance(value, origin)
 
-# --- Decorator 1: Execution Logger ---
-def log_execution(func: Callable) -> Callable:
+    if issubclass(origin, Mapping):
+        key_check = _compile_check(args[0], sample_size)
+        value_check = _compile_check(args[1], sample_size) if len(args) > 1 else None
+
+        def check_mapping(value):
+            if not isinstance(value, origin):
+                return False
+            for k in _sampled(value, sample_size):
+                if key_check is not None and not key_check(k):
+                    return False
+                if value_check is not None and not value_check(value[k]):
+                    return False
+            return True
+
+        return check_mapping
+
+    if origin is tuple:
+        if len(args) == 2 and args[1] is Ellipsis:
+            item_check = _compile_check(args[0], sample_size)
+            if item_check is None:
+                return lambda value: isinstance(value, tuple)
+            return lambda value: isinstance(value, tuple) and all(
+                item_check(v) for v in _sampled(value, sample_size))
+        checks = [_compile_check(arg, sample_size) for arg in args]
+        return lambda value: (isinstance(value, tuple) and len(value) == len(checks) and all(
+            check is None or check(v) for check, v in zip(checks, value)))
+
+    if issubclass(origin, Collection) and not issubclass(origin, (str, bytes)):
+        item_check = _compile_check(args[0], sample_size)
+        if item_check is None:
+            return lambda value: isinstance(value, origin)
+        return lambda value: isinstance(value, origin) and all(
+            item_check(v) for v in _sampled(value, sample_size))
+
+    return lambda value: isinstance(value, origin)
+
+
+def _resolve_hints(target: Callable) -> Dict[str, Any]:
     """
-    Logs the start and end of a function execution, including arguments.
+    typing.get_type_hints(), falling back to resolving each annotation on
+    its own when one of them can't be (e.g. a string naming a local class
+    under `from __future__ import annotations`). Only the unresolvable
+    parameters lose their check, and each is logged.
+    """
+    try:
+        return typing.get_type_hints(target)
+    except Exception:
+        pass
+    namespace = getattr(target, "__globals__", {})
+    hints = {}
+    for name, annotation in getattr(target, "__annotations__", {}).items():
+        try:
+            hints[name] = typing.get_type_hints(types.SimpleNamespace(__annotations__={name: annotation}),
+                                                globalns=namespace)[name]
+        except Exception as e:
+            logger.warning("VALIDATION: not checking %r of %s, its type hint %r can't be resolved: %s",
+                           name, target.__qualname__, annotation, e)
+    return hints
+
+
+def validate_input_types(func: Optional[Callable] = None, *, sample_size: Optional[int] = 100) -> Callable:
+    """
+    Checks that arguments passed to the function match the type hints.
+
+    The signature and hints are compiled into per-parameter checkers once,
+    at decoration time. Positional and keyword arguments are both checked;
+    Union/Optional, Literal, Tuple and List/Set/Dict element types are
+    supported, inspecting at most `sample_size` elements per container
+    (None = all). Set VALIDATION_ENABLED = False to skip checks entirely.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        target = inspect.unwrap(func)
+        hints = _resolve_hints(target)
+        signature = inspect.signature(target)
+
+        positional_checks: List[Tuple[int, str, _Check, Any]] = []
+        keyword_checks: Dict[str, Tuple[_Check, Any]] = {}
+        var_positional: Optional[Tuple[int, str, _Check, Any]] = None
+        var_keyword: Optional[Tuple[_Check, Any]] = None
+
+        for index, (name, param) in enumerate(signature.parameters.items()):
+            hint = hints.get(name, inspect.Parameter.empty)
+            check = _compile_check(hint, sample_size)
+            if check is None:
+                continue
+            if param.kind is param.VAR_POSITIONAL:
+                var_positional = (index, name, check, hint)
+            elif param.kind is param.VAR_KEYWORD:
+                var_keyword = (check, hint)
+            else:
+                if param.kind is not param.KEYWORD_ONLY:
+                    positional_checks.append((index, name, check, hint))
+                if param.kind is not param.POSITIONAL_ONLY:
+                    keyword_checks[name] = (check, hint)
+
+        def fail(name: str, hint: Any, value: Any):
+            raise TypeError(f"Argument '{name}' must be {_type_name(hint)}, got {type(value).__name__}")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if VALIDATION_ENABLED:
+                nargs = len(args)
+                for index, name, check, hint in positional_checks:
+                    if index >= nargs:
+                        break
+                    if not check(args[index]):
+                        fail(name, hint, args[index])
+                if var_positional is not None:
+                    start, name, check, hint = var_positional
+                    for value in args[start:]:
+                        if not check(value):
+                            fail(name, hint, value)
+                for name, value in kwargs.items():
+                    entry = keyword_checks.get(name, var_keyword)
+                    if entry is not None and not entry[0](value):
+                        fail(name, entry[1], value)
+
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+# --- Decorator 7: Fused Policy Stack ---
+def compose(*, roles: Optional[List[str]] = None, cache: Union[bool, Dict[str, Any], None] = None,
+            timed: bool = False, logged: bool = False) -> Callable:
+    """
+    Fuses require_role, cache_result, measure_time and log_execution into
+    one wrapper, replacing a stack of nested decorators (one frame and one
+    *args/**kwargs repack each). Policies run in this order:
+
+        roles -> cache lookup (a hit returns right here) -> log + time the call -> cache store
+
+    `cache` is True for the cache_result defaults or a dict of its keyword
+    arguments (maxsize, ttl, single_flight, persist, tags, shared,
+    max_bytes, sizer, hot_keys, hot_keys_path). The wrapper exposes
+    the same `cache` / `cache_info` / `histogram` attributes as the
+    individual decorators. With TRACING_ENABLED each call runs in a span
+    and cache hits are marked "cache": "hit". See benchmark_decorator_overhead().
+    """
+    cache_options = {} if cache is True else dict(cache or {})
+
+    def decorator(func: Callable) -> Callable:
+        name = func.__name__
+        qualname = func.__qualname__
+        authorize = _compile_authorizer(roles, name) if roles is not None else None
+        store = None
+        flights = None
+        if cache:
+            persist = cache_options.get("persist")
+            store = ResultCache(
+                maxsize=cache_options.get("maxsize", 128),
+                ttl=cache_options.get("ttl"),
+                backing=DiskCache.for_function(persist, func) if persist else None,
+                shared=_shared_tier(func, cache_options.get("shared")),
+                max_bytes=cache_options.get("max_bytes"),
+                sizer=cache_options.get("sizer", estimate_size),
+            )
+            if cache_options.get("single_flight"):
+                flights = _SingleFlight(store.record_coalesced)
+        tagger = _compile_tagger(func, cache_options.get("tags"))
+        hot = _HotKeys(cache_options["hot_keys"]) if cache and cache_options.get("hot_keys") else None
+        histogram = get_histogram(func.__qualname__) if timed else None
+        spans = TRACING_ENABLED
+
+        if inspect.iscoroutinefunction(func):
+            async def invoke(args, kwargs, key):
+                if store is not None:
+                    result = store.peek(key)
+                    if result is not _MISSING:
+                        return result
+                sampled = logged and logger.isEnabledFor(logging.INFO)
+                if sampled:
+                    logger.info("Adding call to stack: %s", _LazyCallRepr(name, args, kwargs, 200))
+                snapshot = store.snapshot(tagger(args, kwargs) if tagger else ()) if store is not None else None
+                start_time = time.perf_counter_ns()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if logged:
+                        logger.error("Function %s raised exception: %s", name, e)
+                    raise
+                finally:
+                    elapsed = time.perf_counter_ns() - start_time
+                    if histogram is not None:
+                        histogram.record(elapsed)
+                if sampled:
+                    logger.info("Function %s returned: %s...", name, _LazyTruncated(result, 50))
+                if store is not None:
+                    store.set(key, result, cost=elapsed / 1e9, snapshot=snapshot)
+                return result
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if authorize is not None:
+                    authorize()
+                key = None
+                if store is not None:
+                    key = _make_key(args, kwargs)
+                    if hot is not None:
+                        hot.record(key, args, kwargs)
+                    result = store.get(key)
+                    if result is not _MISSING:
+                        if spans:
+                            _current_span.get().attributes["cache"] = "hit"
+                        return result
+                    if flights is not None:
+                        return await flights.do_async(key, lambda: invoke(args, kwargs, key))
+                return await invoke(args, kwargs, key)
+        else:
+            def invoke(args, kwargs, key):
+                if store is not None:
+                    # Re-check: a single-flight leader may have filled the entry
+                    result = store.peek(key)
+                    if result is not _MISSING:
+                        return result
+                sampled = logged and logger.isEnabledFor(logging.INFO)
+                if sampled:
+                    logger.info("Adding call to stack: %s", _LazyCallRepr(name, args, kwargs, 200))
+                snapshot = store.snapshot(tagger(args, kwargs) if tagger else ()) if store is not None else None
+                start_time = time.perf_counter_ns()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if logged:
+                        logger.error("Function %s raised exception: %s", name, e)
+                    raise
+                finally:
+                    elapsed = time.perf_counter_ns() - start_time
+                    if histogram is not None:
+                        histogram.record(elapsed)
+                if sampled:
+                    logger.info("Function %s returned: %s...", name, _LazyTruncated(result, 50))
+                if store is not None:
+                    store.set(key, result, cost=elapsed / 1e9, snapshot=snapshot)
+                return result
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if authorize is not None:
+                    authorize()
+                key = None
+                if store is not None:
+                    key = _make_key(args, kwargs)
+                    if hot is not None:
+                        hot.record(key, args, kwargs)
+                    result = store.get(key)
+                    if result is not _MISSING:
+                        if spans:
+                            _current_span.get().attributes["cache"] = "hit"
+                        return result
+                    if flights is not None:
+                        return flights.do(key, lambda: invoke(args, kwargs, key))
+                return invoke(args, kwargs, key)
+
+        if spans:
+            wrapper = _with_span(wrapper, qualname)
+        if store is not None:
+            wrapper.cache = store
+            wrapper.cache_info = store.stats
+            wrapper.cache_clear = store.clear
+            wrapper.cache_invalidate = store.invalidate_all
+            _attach_cache_access(wrapper, store, flights, tagger, hot, inspect.iscoroutinefunction(func))
+            _attach_hot_keys(wrapper, hot, cache_options.get("hot_keys_path"))
+        if histogram is not None:
+            wrapper.histogram = histogram
+        return wrapper
+
+    return decorator
+
+
+def benchmark_decorator_overhead(calls: int = 200_000) -> Dict[str, float]:
+    """
+    Micro-benchmark: per-call overhead (ns) of the nested
+    require_role -> cache_result -> measure_time stack versus the same
+    policies fused by compose(), measured on the cache-hit path (both run
+    the role check, neither times a hit), plus the cost of opening and
+    closing one span.
+    """
+
+    def make_work(label):
+        def work(x):
+            return x
+        # Throwaway names: the histograms are dropped again below
+        work.__qualname__ = f"benchmark_decorator_overhead.<{label}-{id(work):x}>"
+        return work
+
+    work = make_work("bare")
+    nested_work, fused_work = make_work("nested"), make_work("fused")
+    nested = require_role(["admin"])(cache_result(measure_time(nested_work)))
+    fused = compose(roles=["admin"], cache=True, timed=True)(fused_work)
+
+    previous_level = logger.level
+    logger.setLevel(logging.WARNING)  # Measure the decorators, not the log handlers
+    recorded_spans = list(_SPAN_BUFFER)  # Keep benchmark spans out of the real trace
+    token = set_current_user("admin_user")
+    try:
+        results = {}
+        for label, wrapped in (("bare", work), ("nested", nested), ("fused", fused)):
+            wrapped(1)  # Warm the cache
+            start = time.perf_counter_ns()
+            for _ in range(calls):
+                wrapped(1)
+            results[f"{label}_ns_per_call"] = (time.perf_counter_ns() - start) / calls
+
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            span, span_token = _open_span("benchmark")
+            _close_span(span, span_token)
+        results["span_ns_per_call"] = (time.perf_counter_ns() - start) / calls
+    finally:
+        reset_current_user(token)
+        logger.setLevel(previous_level)
+        _SPAN_BUFFER.clear()
+        _SPAN_BUFFER.extend(recorded_spans)
+        with _HISTOGRAMS_LOCK:
+            for benchmarked in (nested_work, fused_work):
+                _HISTOGRAMS.pop(benchmarked.__qualname__, None)
+    return results
+
+
+# --- Decorator 8: Bulkhead (Concurrency Limit) ---
+class BulkheadFullError(RuntimeError):
+    """Raised when a bulkhead's wait queue is full or the wait timed out."""
+
+
+class _BulkheadWaiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+
+def _wake(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Bulkhead:
     """
+    Caps concurrent calls at `max_concurrent`, with a FIFO wait queue of
+    `max_queue` callers; anyone beyond that is rejected immediately with
+    BulkheadFullError, as are waiters that exceed `timeout` seconds.
+    Threads and asyncio tasks can share the same bulkhead: a released slot
+    is handed directly to the oldest waiter of either kind.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 0, timeout: Optional[float] = None):
+        if max_concurrent <= 0:
+            raise ValueError("max_concurrent must be positive")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters: "deque[_BulkheadWaiter]" = deque()
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed = 0
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        args_repr = [repr(a) for a in args]
-        kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
-        signature = ", ".join(args_repr + kwargs_repr)
+    def _try_enter(self, loop: Optional[asyncio.AbstractEventLoop]) -> Optional[_BulkheadWaiter]:
+        """Takes a free slot (returns None) or enqueues and returns a waiter. Caller holds the lock."""
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFullError(f"Bulkhead '{self.name}' is full ({self.in_flight} running, "
+                                    f"{len(self._waiters)} queued)")
+        waiter = _BulkheadWaiter(loop)
+        self._waiters.append(waiter)
+        return waiter
 
-        logger.info(f"Adding call to stack: {func.__name__}({signature})")
+    def _abandon(self, waiter: _BulkheadWaiter) -> bool:
+        """Removes a waiter that gave up; False if it was granted a slot in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            self.rejected += 1
+            return True
 
+    def acquire(self) -> None:
+        with self._lock:
+            waiter = self._try_enter(None)
+        if waiter is None:
+            return
+        if not waiter.event.wait(self.timeout) and self._abandon(waiter):
+            raise BulkheadFullError(f"Timed out after {self.timeout}s waiting for bulkhead '{self.name}'")
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = self._try_enter(loop)
+        if waiter is None:
+            return
         try:
-            result = func(*args, **kwargs)
-            logger.info(f"Function {func.__name__} returned: {str(result)[:50]}...")  # Truncate long output
-            return result
-        except Exception as e:
-            logger.error(f"Function {func.__name__} raised exception: {e}")
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                raise BulkheadFullError(f"Timed out after {self.timeout}s waiting for bulkhead '{self.name}'")
+        except asyncio.CancelledError:
+            if not self._abandon(waiter):
+                self.release()  # The slot was handed to us; pass it on
             raise
 
-    return wrapper
+    def release(self) -> None:
+        with self._lock:
+            self.completed += 1
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True  # Slot moves to the waiter; in_flight is unchanged
+                if waiter.loop is None:
+                    waiter.event.set()
+                else:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                return
+            self.in_flight -= 1
 
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+            }
 
-# --- Decorator 2: Performance Timer ---
-def measure_time(func: Callable) -> Callable:
+
+# Named pools shared by every function that uses the same bulkhead name
+_BULKHEADS: Dict[str, Bulkhead] = {}
+_BULKHEADS_LOCK = threading.Lock()
+
+
+def get_bulkhead(name: str, max_concurrent: int, max_queue: int = 0, timeout: Optional[float] = None) -> Bulkhead:
+    with _BULKHEADS_LOCK:
+        pool = _BULKHEADS.get(name)
+        if pool is None:
+            pool = _BULKHEADS[name] = Bulkhead(name, max_concurrent, max_queue, timeout)
+        return pool
+
+
+def bulkhead(max_concurrent: int, max_queue: int = 0, *, name: Optional[str] = None,
+             timeout: Optional[float] = None) -> Callable:
     """
-    Calculates and prints the execution time of the decorated function.
+    Limits how many calls of the decorated function run at once.
+
+    Without `name` each function gets its own limit; functions decorated
+    with the same `name` share one pool (the first declaration sets its
+    size). Extra callers wait in a queue of `max_queue` (default: none)
+    and are rejected with BulkheadFullError when it is full. Counters are
+    available via `wrapper.bulkhead.stats()`.
     """
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.perf_counter()
-        result = func(*args, **kwargs)
-        end_time = time.perf_counter()
-        run_time = end_time - start_time
-        logger.info(f"PERFORMANCE: {func.__name__} took {run_time:.4f} seconds")
-        return result
+    def decorator(func: Callable) -> Callable:
+        if name is not None:
+            pool = get_bulkhead(name, max_concurrent, max_queue, timeout)
+        else:
+            pool = Bulkhead(func.__qualname__, max_concurrent, max_queue, timeout)
 
-    return wrapper
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                await pool.acquire_async()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    pool.release()
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                pool.acquire()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    pool.release()
+
+        wrapper.bulkhead = pool
+        return wrapper
 
+    return decorator
 
-# --- Decorator 3: Role-Based Access Control (Decorator with Arguments) ---
-def require_role(allowed_roles: List[str]) -> Callable:
+
+# --- Decorator 9: Micro-Batching ---
+class _PendingBatch:
+    __slots__ = ("calls", "full")
+
+    def __init__(self, full):
+        self.calls: List[Tuple[Any, Any]] = []  # (item, future)
+        self.full = full
+
+
+def _settle_batch(calls: List[Tuple[Any, Any]], results: Any) -> None:
+    """Hands each caller its own result; an Exception in a result slot fails only that caller."""
+    for (_, future), result in zip(calls, results):
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+def _check_batch_results(calls: List[Tuple[Any, Any]], results: Any) -> List[Any]:
+    results = list(results)
+    if len(results) != len(calls):
+        raise ValueError(f"Batch function returned {len(results)} results for {len(calls)} items")
+    return results
+
+
+def _group_by_context(calls: List[Tuple[Any, Any]]) -> List[Tuple[tuple, List[Tuple[Any, Any]]]]:
+    """
+    Splits ((context, item), future) calls into one group per context (the
+    leading arguments, e.g. `self`), matched by identity so unhashable or
+    oddly-comparing objects still batch.
+    """
+    groups: List[Tuple[tuple, List[Tuple[Any, Any]]]] = []
+    for (context, item), future in calls:
+        for group_context, group in groups:
+            if len(group_context) == len(context) and all(a is b for a, b in zip(group_context, context)):
+                group.append((item, future))
+                break
+        else:
+            groups.append((context, [(item, future)]))
+    return groups
+
+
+def _fail_pending(calls: List[Tuple[Any, Any]], error: Optional[BaseException]) -> None:
+    """Settles every future the batch left open, so no caller waits forever."""
+    for _, future in calls:
+        if future.done():
+            continue
+        if isinstance(error, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(error or RuntimeError("Batch finished without a result for this item"))
+
+
+class _MicroBatcher:
+    """Thread version: the first caller of a batch waits for it to fill (or time out), then runs it."""
+
+    def __init__(self, func: Callable, max_size: int, max_wait: float):
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._current = _PendingBatch(threading.Event())
+        self.stats = {"batches": 0, "items": 0, "isolated_retries": 0}
+
+    def submit(self, item: Any, context: tuple = ()) -> Any:
+        future = Future()
+        with self._lock:
+            batch = self._current
+            batch.calls.append(((context, item), future))
+            leader = len(batch.calls) == 1
+            if len(batch.calls) >= self.max_size:
+                self._current = _PendingBatch(threading.Event())  # Close it to new callers
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._current is batch:
+                    self._current = _PendingBatch(threading.Event())
+            self._run(batch.calls)
+        return future.result()
+
+    def _run(self, calls: List[Tuple[Any, Any]]) -> None:
+        error = None
+        try:
+            for context, group in _group_by_context(calls):
+                self._run_group(context, group)
+        except BaseException as e:  # e.g. KeyboardInterrupt: the leader re-raises it, followers get it too
+            error = e
+            raise
+        finally:
+            _fail_pending(calls, error)
+
+    def _run_group(self, context: tuple, calls: List[Tuple[Any, Any]]) -> None:
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["items"] += len(calls)
+        try:
+            results = _check_batch_results(calls, self.func(*context, [item for item, _ in calls]))
+        except Exception as e:
+            if len(calls) == 1:
+                calls[0][1].set_exception(e)
+                return
+            # Isolate the failure: re-run every item on its own
+            with self._lock:
+                self.stats["isolated_retries"] += 1
+            for call in calls:
+                self._run_group(context, [call])
+            return
+        _settle_batch(calls, results)
+
+
+class _AsyncMicroBatcher:
+    """asyncio version: the first call of a batch schedules a flush task on the event loop."""
+
+    def __init__(self, func: Callable, max_size: int, max_wait: float):
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._current: Optional[_PendingBatch] = None
+        self.stats = {"batches": 0, "items": 0, "isolated_retries": 0}
+
+    async def submit(self, item: Any, context: tuple = ()) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._current
+        if batch is None:
+            batch = self._current = _PendingBatch(asyncio.Event())
+            loop.create_task(self._flush(batch))
+        batch.calls.append(((context, item), future))
+        if len(batch.calls) >= self.max_size:
+            self._current = None
+            batch.full.set()
+        return await future
+
+    async def _flush(self, batch: _PendingBatch) -> None:
+        error = None
+        try:
+            try:
+                await asyncio.wait_for(batch.full.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            if self._current is batch:
+                self._current = None
+            for context, group in _group_by_context(batch.calls):
+                await self._run(context, group)
+        except BaseException as e:  # Including cancellation of the flush task at loop shutdown
+            error = e
+            if isinstance(e, (asyncio.CancelledError, KeyboardInterrupt, SystemExit)):
+                raise
+            # Anything else reaches every caller below; re-raising would only log "never retrieved"
+        finally:
+            if self._current is batch:
+                self._current = None
+            _fail_pending(batch.calls, error)
+
+    async def _run(self, context: tuple, calls: List[Tuple[Any, Any]]) -> None:
+        self.stats["batches"] += 1
+        self.stats["items"] += len(calls)
+        try:
+            results = _check_batch_results(calls, await self.func(*context, [item for item, _ in calls]))
+        except Exception as e:
+            if len(calls) == 1:
+                if not calls[0][1].done():
+                    calls[0][1].set_exception(e)
+                return
+            self.stats["isolated_retries"] += 1
+            for call in calls:
+                await self._run(context, [call])
+            return
+        # Callers that were cancelled meanwhile simply don't get their result
+        _settle_batch([(i, f) for i, f in calls if not f.done()],
+                      [r for (_, f), r in zip(calls, results) if not f.done()])
+
+
+def batched(max_size: int = 64, max_wait_ms: float = 5.0) -> Callable:
     """
-    Enforces that the CURRENT_USER has one of the allowed roles.
+    Turns a batch implementation `func(items) -> results` into a per-item
+    call `wrapper(item) -> result`. Methods work too: `func(self, items)`
+    becomes `obj.method(item)`, and only calls on the same object share a
+    batch (any other leading arguments are grouped the same way).
+
+    Calls arriving from many threads (or asyncio tasks, if `func` is a
+    coroutine function) within `max_wait_ms` are coalesced into a single
+    `func` call of at most `max_size` items, and results are scattered
+    back in order. A result slot holding an Exception fails only that
+    caller; if the whole batch raises, each item is retried on its own so
+    one bad item can't fail its neighbours; if it raises anything else
+    (KeyboardInterrupt, cancellation) every waiting caller gets that.
+    Counters: `wrapper.batch_stats`.
     """
+    if max_size <= 0:
+        raise ValueError("max_size must be positive")
 
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            if not CURRENT_USER:
-                raise PermissionError("Authentication required: No user logged in.")
+        if inspect.iscoroutinefunction(func):
+            batcher = _AsyncMicroBatcher(func, max_size, max_wait_ms / 1000.0)
 
-            user_role = USER_ROLES.get(CURRENT_USER)
-            if user_role not in allowed_roles:
-                raise PermissionError(
-                    f"Access Denied: User '{CURRENT_USER}' (Role: {user_role}) "
-                    f"does not have required permissions: {allowed_roles}"
-                )
+            @functools.wraps(func)
+            async def wrapper(*args):
+                return await batcher.submit(args[-1], args[:-1])
+        else:
+            batcher = _MicroBatcher(func, max_size, max_wait_ms / 1000.0)
 
-            logger.info(f"ACCESS GRANTED: {CURRENT_USER} authorized for {func.__name__}")
-            return func(*args, **kwargs)
+            @functools.wraps(func)
+            def wrapper(*args):
+                return batcher.submit(args[-1], args[:-1])
 
+        wrapper.batch_stats = batcher.stats
         return wrapper
 
     return decorator
 
 
-# --- Decorator 4: In-Memory Caching (Memoization) ---
-def cache_result(func: Callable) -> Callable:
+# --- Decorator 10: On-Demand Profiling ---
+_PROFILE_SEQ = itertools.count(1)
+
+# One capture at a time per process: cProfile installs one hook per thread
+# (and on 3.12+ allows one active profiler per process), so a call that
+# finds the lock taken, including a profiled call nested inside a capture,
+# simply runs unprofiled. Nested calls still show up in the outer report.
+_CAPTURE_LOCK = threading.Lock()
+
+# tracemalloc is process-global: it stays on while any capture needs it and
+# is only stopped if we were the ones who started it
+_TRACEMALLOC_LOCK = threading.Lock()
+_TRACEMALLOC_USERS = 0
+_TRACEMALLOC_STARTED = False
+
+
+def _retain_tracemalloc() -> None:
+    global _TRACEMALLOC_USERS, _TRACEMALLOC_STARTED
+    with _TRACEMALLOC_LOCK:
+        if _TRACEMALLOC_USERS == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            _TRACEMALLOC_STARTED = True
+        _TRACEMALLOC_USERS += 1
+
+
+def _release_tracemalloc() -> None:
+    global _TRACEMALLOC_USERS, _TRACEMALLOC_STARTED
+    with _TRACEMALLOC_LOCK:
+        _TRACEMALLOC_USERS -= 1
+        if _TRACEMALLOC_USERS == 0 and _TRACEMALLOC_STARTED:
+            tracemalloc.stop()
+            _TRACEMALLOC_STARTED = False
+
+
+class _ProfileTarget:
     """
-    Caches the result of a function call based on its arguments.
-    Useful for expensive computations.
+    Capture state for one @profiled function. While `armed` is False the
+    wrapper does nothing but read that flag. Failures inside the profiler
+    are logged and never reach the profiled call.
     """
-    cache: Dict[str, Any] = {}
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Create a unique key based on arguments
-        key = str(args) + str(kwargs)
+    def __init__(self, name: str, output_dir: str):
+        self.name = name
+        self.output_dir = output_dir
+        self.armed = False
+        self._lock = threading.RLock()  # Re-entrant: the SIGUSR1 handler may run while it is held
+        self._remaining = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._baseline: Optional[tracemalloc.Snapshot] = None
 
-        if key in cache:
-            logger.info(f"CACHE HIT: Returning cached result for {func.__name__}")
-            return cache[key]
+    def arm(self, calls: int) -> None:
+        with self._lock:
+            self._remaining = calls
+            self.armed = calls > 0
 
-        result = func(*args, **kwargs)
-        cache[key] = result
-        logger.info(f"CACHE MISS: Storing result for {func.__name__}")
-        return result
+    def _abandon(self) -> None:
+        """Drops a capture that could not be started; called with self._lock held."""
+        self.armed = False
+        if self._profile is not None:
+            self._profile = self._baseline = None
+            _release_tracemalloc()
 
-    return wrapper
+    def begin(self) -> Optional[cProfile.Profile]:
+        """
+        Starts profiling one call and returns the running profiler, or None
+        if disarmed, another capture is running, or the profiler failed to
+        start. A non-None result must be handed back to end().
+        """
+        if not self.armed or not _CAPTURE_LOCK.acquire(blocking=False):
+            return None
+        try:
+            with self._lock:
+                if not self.armed:
+                    _CAPTURE_LOCK.release()
+                    return None
+                if self._profile is None:
+                    _retain_tracemalloc()
+                    self._profile = cProfile.Profile()
+                    try:
+                        self._baseline = tracemalloc.take_snapshot()
+                    except Exception:
+                        self._abandon()
+                        raise
+                profile = self._profile
+                try:
+                    profile.enable()  # ValueError on 3.12+ if a debugger or coverage tool holds the hook
+                except Exception:
+                    self._abandon()
+                    raise
+            return profile
+        except Exception:
+            _CAPTURE_LOCK.release()
+            logger.exception("PROFILE: could not start profiling %s; capture abandoned", self.name)
+            return None
+
+    def end(self, profile: cProfile.Profile) -> None:
+        try:
+            profile.disable()
+        finally:
+            _CAPTURE_LOCK.release()
+        with self._lock:
+            if profile is not self._profile:
+                return  # Abandoned or re-armed meanwhile
+            self._remaining -= 1
+            if self._remaining > 0:
+                return
+            self.armed = False
+            baseline = self._baseline
+            self._profile = self._baseline = None
+        try:
+            self._write_reports(profile, baseline)
+        except Exception:
+            logger.exception("PROFILE: could not write reports for %s", self.name)
+        finally:
+            _release_tracemalloc()
 
+    def _write_reports(self, profile: cProfile.Profile, baseline: tracemalloc.Snapshot) -> None:
+        snapshot = tracemalloc.take_snapshot()
 
-# --- Decorator 5: Automatic Retry Logic ---
-def retry(max_retries: int = 3, delay: float = 1.0) -> Callable:
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in self.name)
+        # Millisecond timestamp + PID + per-process sequence: captures never overwrite each other
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}.{int(time.time() * 1000) % 1000:03d}"
+        prefix = os.path.join(self.output_dir, f"{safe_name}-{stamp}-{os.getpid()}-{next(_PROFILE_SEQ)}")
+        profile.dump_stats(prefix + ".pstats")
+
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(30)
+        with open(prefix + ".txt", "w") as f:
+            f.write(text.getvalue())
+
+        with open(prefix + ".alloc.txt", "w") as f:
+            f.write(f"Top allocations during profiled calls of {self.name}\n")
+            for stat in snapshot.compare_to(baseline, "lineno")[:25]:
+                f.write(f"{stat}\n")
+        logger.info("PROFILE: wrote %s.{pstats,txt,alloc.txt}", prefix)
+
+
+# Every @profiled function, by qualified name
+_PROFILE_TARGETS: Dict[str, _ProfileTarget] = {}
+
+
+def profiled(func: Optional[Callable] = None, *, output_dir: Optional[str] = None) -> Callable:
     """
-    Retries the execution of a function if it fails with a generic Exception.
+    Registers the function for on-demand profiling.
+
+    Once armed with enable_profiling() (or SIGUSR1, see
+    install_profiling_signal), the next N calls run under cProfile and
+    tracemalloc, after which pstats, a text summary and the top allocations
+    are written to `output_dir` (PROFILE_DIR by default). Disarmed, the
+    wrapper only checks a flag. Only one call is captured at a time per
+    process; calls made meanwhile run unprofiled (on the same thread they
+    still appear in the outer report).
     """
 
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < max_retries:
+        target = _ProfileTarget(func.__qualname__, output_dir or PROFILE_DIR)
+        _PROFILE_TARGETS[target.name] = target
+
+        if inspect.iscoroutinefunction(func):
+            # cProfile follows the thread, so this also sees other tasks run during awaits
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                profile = target.begin() if target.armed else None
+                if profile is None:
+                    return await func(*args, **kwargs)
                 try:
+                    return await func(*args, **kwargs)
+                finally:
+                    target.end(profile)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                profile = target.begin() if target.armed else None
+                if profile is None:
                     return func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    logger.warning(f"Attempt {attempts}/{max_retries} failed for {func.__name__}: {e}")
-                    if attempts == max_retries:
-                        logger.error(f"All {max_retries} attempts failed.")
-                        raise
-                    time.sleep(delay)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    target.end(profile)
 
+        wrapper.profile_target = target
         return wrapper
 
+    if func is not None:
+        return decorator(func)
     return decorator
 
 
-# --- Decorator 6: Type Validator (Introspection) ---
-def validate_input_types(func: Callable) -> Callable:
+def enable_profiling(target: Union[str, Callable, None] = None, calls: int = 10) -> List[str]:
     """
-    Checks that arguments passed to the function match the type hints.
+    Arms profiling for the next `calls` calls of one @profiled function
+    (by qualified name or the function itself) or, with no target, all of
+    them. Returns the names that were armed.
+    """
+    if target is None:
+        names = list(_PROFILE_TARGETS)
+    elif isinstance(target, str):
+        names = [target]
+    else:
+        names = [target.profile_target.name]
+    for name in names:
+        if name not in _PROFILE_TARGETS:
+            raise KeyError(f"No @profiled function named {name!r}")
+        _PROFILE_TARGETS[name].arm(calls)
+    return names
+
+
+def install_profiling_signal(signum: Optional[int] = None, calls: int = 10) -> None:
     """
+    Makes `kill -USR1 <pid>` arm every @profiled function for `calls` calls.
+    Must be called from the main thread.
+    """
+    if signum is None:
+        signum = getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            raise ValueError("SIGUSR1 is not available on this platform; pass signum explicitly")
+    signal.signal(signum, lambda _signum, _frame: enable_profiling(calls=calls))
+
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Get type hints
-        hints = func.__annotations__
+# --- Statistics Engine ---
+_ROW_BYTES = 8  # float64
 
-        # Check positional args (skipping 'self' if it's a method)
-        arg_names = func.__code__.co_varnames[:func.__code__.co_argcount]
 
-        for idx, arg_val in enumerate(args):
-            if idx < len(arg_names):
-                arg_name = arg_names[idx]
-                if arg_name == 'self': continue
+class RunningMoments:
+    """
+    Mergeable count / mean / M2 / min / max (Welford, with Chan et al.'s
+    parallel merge), so partial results from chunks or processes combine
+    exactly without ever holding the whole dataset.
+    """
+    __slots__ = ("count", "mean", "m2", "min", "max")
 
-                if arg_name in hints:
-                    expected_type = hints[arg_name]
-                    if not isinstance(arg_val, expected_type):
-                        raise TypeError(
-                            f"Argument '{arg_name}' must be {expected_type.__name__}, got {type(arg_val).__name__}")
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
 
-        return func(*args, **kwargs)
+    def _combine(self, count: int, mean: float, m2: float, low: float, high: float) -> None:
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
 
-    return wrapper
+    def update(self, block) -> None:
+        """Folds in one block of values (NumPy array or sequence of floats)."""
+        if np is not None:
+            block = np.asarray(block, dtype=np.float64)
+            block = block[~np.isnan(block)]
+            if not block.size:
+                return
+            mean = float(block.mean())
+            deviations = block - mean
+            self._combine(block.size, mean, float(deviations @ deviations),
+                          float(block.min()), float(block.max()))
+        else:
+            values = [x for x in block if x == x]  # Drops NaNs
+            if not values:
+                return
+            mean = math.fsum(values) / len(values)
+            m2 = math.fsum((x - mean) * (x - mean) for x in values)
+            self._combine(len(values), mean, m2, min(values), max(values))
+
+    def merge(self, other: "RunningMoments") -> "RunningMoments":
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance (ddof=0, like numpy.var)."""
+        return self.m2 / self.count if self.count else 0.0
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative error `alpha` (DDSketch-style).
+    Values are counted in logarithmic buckets, so memory depends on the
+    value range, not on the number of rows.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    _MIN_MAGNITUDE = 1e-12  # Anything smaller is counted as zero
+
+    def update(self, block) -> None:
+        if np is not None:
+            block = np.asarray(block, dtype=np.float64)
+            block = block[~np.isnan(block)]
+            magnitudes = np.abs(block)
+            nonzero = magnitudes > self._MIN_MAGNITUDE
+            self.zeros += int(block.size - np.count_nonzero(nonzero))
+            self.count += int(block.size)
+            for store, mask in ((self.positive, nonzero & (block > 0)), (self.negative, nonzero & (block < 0))):
+                if mask.any():
+                    indexes = np.ceil(np.log(magnitudes[mask]) / self._log_gamma).astype(np.int64)
+                    buckets, counts = np.unique(indexes, return_counts=True)
+                    for index, n in zip(buckets.tolist(), counts.tolist()):
+                        store[index] = store.get(index, 0) + n
+        else:
+            log_gamma = self._log_gamma
+            for x in block:
+                if x != x:
+                    continue
+                self.count += 1
+                if abs(x) <= self._MIN_MAGNITUDE:
+                    self.zeros += 1
+                    continue
+                store = self.positive if x > 0 else self.negative
+                index = math.ceil(math.log(abs(x)) / log_gamma)
+                store[index] = store.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, n in theirs.items():
+                mine[index] = mine.get(index, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):  # Most negative first
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+
+class DatasetSummary:
+    """Moments plus quantile sketch for (part of) a dataset; merges across chunks and processes."""
+
+    def __init__(self, alpha: float = 0.01):
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(alpha)
+
+    def update(self, block) -> None:
+        self.moments.update(block)
+        self.sketch.update(block)
+
+    def merge(self, other: "DatasetSummary") -> "DatasetSummary":
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_dict(self, quantiles: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, Any]:
+        m = self.moments
+        result = {
+            "count": m.count,
+            "mean": m.mean if m.count else math.nan,
+            "variance": m.variance,
+            "min": m.min if m.count else math.nan,
+            "max": m.max if m.count else math.nan,
+        }
+        for q in quantiles:
+            result[f"p{q * 100:g}"] = self.sketch.quantile(q)
+        return result
+
+
+def _read_blocks(path: str, start_row: int, stop_row: int, chunk_rows: int):
+    """Yields float64 blocks of at most chunk_rows rows from [start_row, stop_row)."""
+    with open(path, "rb") as f:
+        f.seek(start_row * _ROW_BYTES)
+        remaining = stop_row - start_row
+        while remaining > 0:
+            n = min(chunk_rows, remaining)
+            if np is not None:
+                block = np.fromfile(f, dtype="<f8", count=n)
+                read = block.size
+            else:
+                block = array("d")
+                try:
+                    block.fromfile(f, n)
+                except EOFError:
+                    pass  # Short read: whatever was available is in the block
+                if sys.byteorder == "big":
+                    block.byteswap()
+                read = len(block)
+            if not read:
+                return
+            remaining -= read
+            yield block
+
+
+def _scan_rows(path: str, start_row: int, stop_row: int, chunk_rows: int) -> DatasetSummary:
+    """Process-pool task: single pass over one row range with constant memory."""
+    summary = DatasetSummary()
+    for block in _read_blocks(path, start_row, stop_row, chunk_rows):
+        summary.update(block)
+    return summary
+
+
+def compute_dataset_statistics(path: str, workers: Optional[int] = None,
+                               chunk_rows: int = 1 << 20) -> Dict[str, Any]:
+    """
+    Computes count, mean, variance, min/max and approximate quantiles of a
+    float64 dataset file in one chunked pass. Large files are split into
+    row ranges scanned by a process pool, and the partial summaries are
+    merged; each worker only ever holds one chunk in memory.
+    """
+    rows = os.path.getsize(path) // _ROW_BYTES
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, max(1, rows // chunk_rows))
+
+    if workers <= 1:
+        return _scan_rows(path, 0, rows, chunk_rows).to_dict()
+
+    step = -(-rows // workers)  # Ceiling division
+    bounds = [(start, min(start + step, rows)) for start in range(0, rows, step)]
+    summary = DatasetSummary()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_scan_rows, path, start, stop, chunk_rows) for start, stop in bounds]
+        for future in futures:
+            summary.merge(future.result())
+    return summary.to_dict()
+
+
+def _dataset_task(path: str, dataset_id: int, chunk_rows: int = 1 << 20) -> Tuple[Dict[str, Any], float]:
+    """
+    Process-pool task for batch jobs: one whole dataset per worker, scanned
+    serially. Returns the statistics and the seconds spent (the cache cost).
+    """
+    started = time.perf_counter()
+    stats = _scan_rows(path, 0, os.path.getsize(path) // _ROW_BYTES, chunk_rows).to_dict()
+    stats["id"] = dataset_id
+    return stats, time.perf_counter() - started
+
+
+def _settle_reservation(reservation: "CacheReservation", future: Future) -> None:
+    """
+    Done-callback of a batch task: finishes its reservation as soon as the
+    task does, whether or not anyone is still consuming the batch.
+    """
+    if future.cancelled():
+        reservation.fail(RuntimeError("Batch computation was abandoned before it started"))
+    elif future.exception() is not None:
+        reservation.fail(future.exception())
+    else:
+        stats, elapsed = future.result()
+        reservation.fulfil(stats, elapsed)
+
+
+def write_dataset(path: str, values: Iterable[float]) -> None:
+    """Writes values in the on-disk dataset format (raw little-endian float64)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    buffer = array("d")
+    with open(path, "wb") as f:
+        for value in values:
+            buffer.append(value)
+            if len(buffer) >= 65536:
+                if sys.byteorder == "big":
+                    buffer.byteswap()
+                buffer.tofile(f)
+                buffer = array("d")
+        if sys.byteorder == "big":
+            buffer.byteswap()
+        buffer.tofile(f)
+
+
+def ensure_sample_dataset(dataset_id: int, rows: int = 200_000, dataset_dir: str = DATASET_DIR) -> str:
+    """Creates a deterministic synthetic dataset for the simulation if it doesn't exist yet."""
+    path = os.path.join(dataset_dir, f"{dataset_id}.f64")
+    if not os.path.exists(path):
+        rng = random.Random(dataset_id)
+        write_dataset(path, (rng.gauss(42.5, 3.5) for _ in range(rows)))
+    return path
 
 
 # --- The Core System ---
@@ -177,7 +3604,22 @@ class DataProcessor:
     A simulated complex system class that utilizes various decorators.
     """
 
+    def __init__(self, dataset_dir: str = DATASET_DIR, workers: Optional[int] = None):
+        self.dataset_dir = dataset_dir
+        self.workers = workers
+
+    # Processors reading the same datasets are interchangeable, so they share cache entries
+    def __eq__(self, other):
+        return isinstance(other, DataProcessor) and self.dataset_dir == other.dataset_dir
+
+    def __hash__(self):
+        return hash((DataProcessor, self.dataset_dir))
+
+    def dataset_path(self, dataset_id: int) -> str:
+        return os.path.join(self.dataset_dir, f"{dataset_id}.f64")
+
     @log_execution
+    @bulkhead(1, max_queue=4)
     @require_role(["admin"])
     def delete_database(self, db_name: str):
         """Critical operation requiring admin privileges."""
@@ -185,17 +3627,108 @@ class DataProcessor:
         time.sleep(0.5)
         return "Database Deleted"
 
-    @measure_time
-    @cache_result
-    @require_role(["admin", "analyst"])
+    @profiled
+    @compose(
+        roles=["admin", "analyst"],
+        cache=dict(maxsize=256, ttl=600, single_flight=True, persist=CACHE_DB_PATH, tags="dataset_id",
+                   shared=SHARED_CACHE_ENABLED, max_bytes=64 * 1024 * 1024,
+                   hot_keys=100 if HOT_KEYS_PATH else 0, hot_keys_path=HOT_KEYS_PATH),
+        timed=True,
+    )
     def compute_heavy_statistics(self, dataset_id: int):
-        """Expensive calculation that benefits from caching."""
+        """Expensive single-pass scan of the dataset file that benefits from caching."""
         print(f"--- Computing statistics for dataset {dataset_id} ---")
-        # Simulate heavy work
-        time.sleep(1.5)
-        return {"mean": 42.5, "variance": 12.1, "id": dataset_id}
+        with trace_span("scan_dataset", dataset_id=dataset_id):
+            stats = compute_dataset_statistics(self.dataset_path(dataset_id), workers=self.workers)
+        stats["id"] = dataset_id
+        return stats
+
+    @log_execution
+    @require_role(["admin"])
+    def update_dataset(self, dataset_id: int, values: Iterable[float]):
+        """Rewrites a dataset and invalidates every cached result derived from it."""
+        write_dataset(self.dataset_path(dataset_id), values)
+        invalidate(("dataset_id", dataset_id))
+        return "Dataset Updated"
+
+    @require_role(["admin", "analyst"])
+    def compute_statistics_batch(self, dataset_ids: Iterable[int], max_workers: Optional[int] = None,
+                                 max_in_flight: Optional[int] = None):
+        """
+        Streams (dataset_id, statistics) pairs for many datasets as they finish.
+        IDs are de-duplicated, cached ones are yielded straight from the
+        compute_heavy_statistics cache, and misses are fanned out to a process
+        pool with at most `max_in_flight` tasks outstanding; fresh results are
+        cached for later single calls (which wait for the batch instead of
+        recomputing, and vice versa).
+
+        Each ID is reserved only just before its task is submitted, and the
+        reservation is finished by the task itself, so a paused or abandoned
+        batch never leaves single calls waiting on it.
+        """
+        compute = DataProcessor.compute_heavy_statistics
+        hits, misses = [], []
+        for dataset_id in dict.fromkeys(dataset_ids):  # Order-preserving de-dupe
+            hit, stats = compute.cache_lookup(self, dataset_id)
+            if hit:
+                hits.append((dataset_id, stats))
+            else:
+                misses.append(dataset_id)
+        yield from hits  # Nothing is reserved yet
+
+        waiting = []
+        if misses:
+            max_workers = max_workers or self.workers or os.cpu_count() or 1
+            max_in_flight = max_in_flight or 2 * max_workers
+            queue_ids = iter(misses)
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(misses))) as pool:
+                in_flight = {}
+                try:
+                    while True:
+                        for dataset_id in queue_ids:
+                            reservation = compute.cache_reserve(self, dataset_id)
+                            if not reservation.leader:
+                                waiting.append((dataset_id, reservation))  # A single call is already computing it
+                                continue
+                            try:
+                                future = pool.submit(_dataset_task, self.dataset_path(dataset_id), dataset_id)
+                            except BaseException as e:
+                                reservation.fail(e)
+                                raise
+                            future.add_done_callback(functools.partial(_settle_reservation, reservation))
+                            in_flight[future] = dataset_id
+                            if len(in_flight) >= max_in_flight:
+                                break
+                        if not in_flight:
+                            break
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            dataset_id = in_flight.pop(future)
+                            stats, _ = future.result()  # Already cached by _settle_reservation
+                            yield dataset_id, stats
+                finally:
+                    for future in in_flight:
+                        future.cancel()  # Consumer stopped early or a task failed; fails its reservation
+
+        for dataset_id, reservation in waiting:
+            yield dataset_id, reservation.result()
 
-    @retry(max_retries=3, delay=0.5)
+    @batched(max_size=32, max_wait_ms=10)
+    def describe_dataset(self, dataset_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Called with one dataset_id; concurrent callers are coalesced into one
+        batch lookup that pays the (simulated) catalogue connection cost once.
+        """
+        time.sleep(0.05)  # Connection setup / round-trip
+        return [
+            ValueError(f"Unknown dataset {dataset_id}") if dataset_id < 0
+            else {"id": dataset_id, "owner": "analytics", "format": "f64"}
+            for dataset_id in dataset_ids
+        ]
+
+    @traced  # One parent span, with each retry attempt as a child
+    @retry(max_retries=3, delay=0.5, deadline=5.0, retry_on=(ConnectionError,), circuit_breaker=True)
+    @bulkhead(8, max_queue=32, name="external-api", timeout=10.0)
     @log_execution
     def fetch_external_api(self, url: str):
         """Simulates an unstable network call."""
@@ -204,6 +3737,18 @@ class DataProcessor:
             raise ConnectionError("Network unstable")
         return "200 OK: Data Received"
 
+    @traced
+    @measure_time
+    @retry(max_retries=3, delay=0.5, deadline=5.0, retry_on=(ConnectionError,))
+    @bulkhead(8, max_queue=32, name="external-api", timeout=10.0)
+    @require_role(["admin", "analyst"])
+    async def fetch_external_api_async(self, url: str):
+        """Same unstable call, but awaitable: retries back off with asyncio.sleep."""
+        await asyncio.sleep(0.1)  # Simulated network round-trip
+        if random.random() < 0.5:
+            raise ConnectionError("Network unstable")
+        return f"200 OK: Data Received from {url}"
+
     @validate_input_types
     @log_execution
     def process_financial_data(self, amount: float, currency: str):
@@ -220,11 +3765,17 @@ def run_simulation():
     print("==================================================")
 
     processor = DataProcessor()
-    global CURRENT_USER
+    for dataset_id in (101, 202, 303):
+        ensure_sample_dataset(dataset_id)
+
+    if HOT_KEYS_PATH:
+        # Pre-populate the cache with last run's hottest datasets before "traffic" starts
+        with logged_in_as("admin_user"):
+            DataProcessor.compute_heavy_statistics.warm_up().join()
 
     # Scenario 1: Admin performing heavy tasks and critical ops
     print("\n\n--- SCENARIO 1: ADMIN USER ---")
-    CURRENT_USER = "admin_user"
+    session = set_current_user("admin_user")
 
     # First call - should calculate (slow)
     processor.compute_heavy_statistics(101)
@@ -232,12 +3783,20 @@ def run_simulation():
     # Second call - should use cache (fast)
     processor.compute_heavy_statistics(101)
 
+    # Rewriting a dataset invalidates only the results tagged with its id
+    processor.update_dataset(909, (random.gauss(10.0, 2.0) for _ in range(50_000)))
+    processor.compute_heavy_statistics(909)
+    processor.update_dataset(909, (random.gauss(20.0, 2.0) for _ in range(50_000)))
+    print(f"Fresh after update: mean={processor.compute_heavy_statistics(909)['mean']:.2f}")
+    processor.compute_heavy_statistics(101)  # Still cached
+
     # Admin deletion
     processor.delete_database("production_db")
 
     # Scenario 2: Analyst trying restricted access
     print("\n\n--- SCENARIO 2: ANALYST USER ---")
-    CURRENT_USER = "analyst_user"
+    reset_current_user(session)
+    session = set_current_user("analyst_user")
 
     try:
         # Analyst can compute stats
@@ -264,6 +3823,65 @@ def run_simulation():
     except TypeError as e:
         print(f"Validation Error Caught: {e}")
 
+    # Scenario 5: Cold-cache stampede (Single-Flight)
+    print("\n\n--- SCENARIO 5: CONCURRENT COLD-CACHE CALLS ---")
+    # Threads start with an empty context, so each one runs in a copy of ours
+    workers = [
+        threading.Thread(target=contextvars.copy_context().run, args=(processor.compute_heavy_statistics, 303))
+        for _ in range(5)
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    print(f"Cache stats: {DataProcessor.compute_heavy_statistics.cache_info()}")
+
+    # Scenario 6: Batch statistics for a nightly job
+    print("\n\n--- SCENARIO 6: BATCH STATISTICS ---")
+    for dataset_id in (404, 505):
+        ensure_sample_dataset(dataset_id)
+    for dataset_id, stats in processor.compute_statistics_batch([101, 202, 303, 404, 505, 404]):
+        print(f"Dataset {dataset_id}: mean={stats['mean']:.3f} variance={stats['variance']:.3f}")
+
+    # Scenario 7: Many concurrent small lookups coalesced into batches
+    print("\n\n--- SCENARIO 7: MICRO-BATCHED LOOKUPS ---")
+    lookups = [threading.Thread(target=processor.describe_dataset, args=(n,)) for n in range(100)]
+    for t in lookups:
+        t.start()
+    for t in lookups:
+        t.join()
+    print(f"Batch stats: {DataProcessor.describe_dataset.batch_stats}")
+
+    # Scenario 8: Async calls sharing one event loop
+    print("\n\n--- SCENARIO 8: ASYNCIO EVENT LOOP ---")
+
+    async def fetch_all():
+        urls = [f"http://api.data-provider.com/page/{n}" for n in range(3)]
+        return await asyncio.gather(*(processor.fetch_external_api_async(u) for u in urls), return_exceptions=True)
+
+    for outcome in asyncio.run(fetch_all()):
+        print(outcome)
+
+    print("\n\n--- TRACE (DECORATORS_TRACING=1) ---")
+    spans = get_spans()
+    print(f"Recorded {len(spans)} spans in {len({s.trace_id for s in spans})} traces")
+    slowest = max((s for s in spans if s.parent_id is None), key=lambda s: s.duration_ns, default=None)
+    if slowest is not None:
+        for span in get_spans(slowest.trace_id):
+            print(f"  span {span.span_id} (parent {span.parent_id}) {span.name}: "
+                  f"{span.duration_ns / 1e6:.2f} ms {span.attributes or ''}")
+    if TRACE_PATH:
+        export_chrome_trace(TRACE_PATH)
+        export_spans_jsonl(f"{TRACE_PATH}.jsonl")
+        print(f"Chrome trace written to {TRACE_PATH}")
+
+    print("\n\n--- LATENCY REPORT ---")
+    print(dump_histograms_json())
+
+    print("\n\n--- DECORATOR OVERHEAD (cache hit path) ---")
+    for label, ns in benchmark_decorator_overhead().items():
+        print(f"{label}: {ns:.0f}")
+
     print("\n==================================================")
     print("             SIMULATION COMPLETE")
     print("==================================================")
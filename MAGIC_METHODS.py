@@ -1,18 +1,509 @@
+from array import array
+from collections import ChainMap
+from collections.abc import ItemsView, Mapping, MutableMapping
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+class _RowItemsView(ItemsView):
+    """items() of the compact tables: walks the rows directly instead of looking up every key."""
+    __slots__ = ()
+
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+
+class SpellTable(MutableMapping):
+    """
+    A compact {spell_name: power_level} mapping for very large spell books.
+
+    A dict pays for a str object, an int object and a hash-table entry per
+    spell (well over 100 bytes). Here all names share one UTF-8 buffer, the
+    powers sit in an array('i') column, and an open-addressing hash table
+    of array('i') slots maps names to row numbers: roughly the name's
+    length plus ~20 bytes per spell. Power levels must fit a C int.
+    """
+    __slots__ = ("_names", "_offsets", "_powers", "_alive", "_slots", "_count", "_used")
+
+    _EMPTY = -1
+    _DELETED = -2
+
+    def __init__(self, spells=()):
+        self._names = bytearray()     # Every name, encoded back to back
+        self._offsets = array("I", [0])  # Row i's name is _names[_offsets[i]:_offsets[i + 1]]
+        self._powers = array("i")
+        self._alive = bytearray()     # 0 for rows whose spell was deleted
+        self._slots = array("i", [self._EMPTY]) * 8
+        self._count = 0  # Live spells
+        self._used = 0   # Slots holding a row or a tombstone
+        self.update(spells)
+
+    def _find(self, spell_name):
+        """Returns (slot, row); row is -1 and slot is where to insert when absent."""
+        encoded = spell_name.encode()
+        names, offsets, slots = self._names, self._offsets, self._slots
+        mask = len(slots) - 1
+        i = hash(spell_name) & mask
+        free = -1
+        while True:
+            row = slots[i]
+            if row == self._EMPTY:
+                return (i if free < 0 else free), -1
+            if row == self._DELETED:
+                if free < 0:
+                    free = i
+            elif names[offsets[row]:offsets[row + 1]] == encoded:
+                return i, row
+            i = (i + 1) & mask
+
+    def _name(self, row):
+        return self._names[self._offsets[row]:self._offsets[row + 1]].decode()
+
+    def _resize(self, capacity):
+        if len(self._powers) >= 2 * self._count + 8:  # Mostly deleted rows: drop them too
+            live = list(self.items())
+            self._names = bytearray()
+            self._offsets = array("I", [0])
+            self._powers = array("i", (power for _, power in live))
+            self._alive = bytearray(b"\x01") * len(live)
+            for spell_name, _ in live:
+                self._names += spell_name.encode()
+                self._offsets.append(len(self._names))
+        slots = array("i", [self._EMPTY]) * capacity
+        mask = capacity - 1
+        for row in range(len(self._powers)):
+            if self._alive[row]:
+                i = hash(self._name(row)) & mask
+                while slots[i] != self._EMPTY:
+                    i = (i + 1) & mask
+                slots[i] = row
+        self._slots = slots
+        self._used = self._count
+
+    def __getitem__(self, spell_name):
+        if not isinstance(spell_name, str):
+            raise KeyError(spell_name)
+        _, row = self._find(spell_name)
+        if row < 0:
+            raise KeyError(spell_name)
+        return self._powers[row]
+
+    def __setitem__(self, spell_name, power):
+        if not isinstance(spell_name, str):
+            raise TypeError(f"spell names must be str, not {type(spell_name).__name__}")
+        slot, row = self._find(spell_name)
+        if row >= 0:
+            self._powers[row] = power
+            return
+        self._powers.append(power)  # First, so a bad power leaves the table untouched
+        self._names += spell_name.encode()
+        self._offsets.append(len(self._names))
+        self._alive.append(1)
+        if self._slots[slot] == self._EMPTY:
+            self._used += 1
+        self._slots[slot] = len(self._powers) - 1
+        self._count += 1
+        if self._used * 3 >= len(self._slots) * 2:  # Keep the table at most 2/3 full
+            self._resize(len(self._slots) * 2 if self._count * 2 >= len(self._slots) else len(self._slots))
+        elif len(self._powers) > 2 * len(self._slots):  # Churn: reinserts reuse tombstones but add rows
+            self._resize(len(self._slots))
+
+    def __delitem__(self, spell_name):
+        if not isinstance(spell_name, str):
+            raise KeyError(spell_name)
+        slot, row = self._find(spell_name)
+        if row < 0:
+            raise KeyError(spell_name)
+        self._slots[slot] = self._DELETED  # The row stays behind until the next resize drops it
+        self._alive[row] = 0
+        self._count -= 1
+
+    def __contains__(self, spell_name):
+        return isinstance(spell_name, str) and self._find(spell_name)[1] >= 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for row in range(len(self._powers)):
+            if self._alive[row]:
+                yield self._name(row)
+
+    def _iter_items(self):
+        for row in range(len(self._powers)):
+            if self._alive[row]:
+                yield self._name(row), self._powers[row]
+
+    def items(self):
+        return _RowItemsView(self)
+
+    def __repr__(self):
+        return f"SpellTable({dict(self.items())})"
+
+    @property
+    def nbytes(self):
+        """Bytes held by the table's buffers."""
+        return (len(self._names) + self._offsets.itemsize * len(self._offsets)
+                + self._powers.itemsize * len(self._powers) + len(self._alive)
+                + self._slots.itemsize * len(self._slots))
+
+
+def benchmark_spell_memory(n=1_000_000):
+    """
+    Builds the same n spells as a plain dict and as a SpellTable and returns
+    the bytes each one allocated (measured with tracemalloc).
+    """
+    results = {}
+    for label, factory in (("dict", dict), ("SpellTable", SpellTable)):
+        tracemalloc.start()
+        table = factory()
+        for i in range(n):
+            table[f"Spell of Power {i}"] = i
+        results[f"{label}_bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del table
+    results["ratio"] = results["dict_bytes"] / results["SpellTable_bytes"]
+    return results
+
+
+# ==========================================
+# Memory-Mapped Spell Books (binary format)
+# ==========================================
+# Layout (native byte order, recorded in the header):
+#   header | owner (UTF-8) | names (UTF-8, sorted, back to back) | pad to 8
+#   | name offsets (count + 1 x uint64, relative to the names) | powers (count x int32)
+_MAPPED_MAGIC = b"GRIMOIRE"
+_MAPPED_VERSION = 1
+# magic, version, byte order (0 little / 1 big), count, mana, owner length, names length
+_MAPPED_HEADER = struct.Struct("<8sHHQqIQ")
+
+
+class MappedGrimoireWriter:
+    """
+    Streams spells into the binary format. Spells must arrive in strictly
+    increasing name order; only the offsets and powers (12 bytes per spell)
+    are held in memory until close(). The file appears atomically on close.
+
+        with MappedGrimoireWriter(path, "Gandalf", 100) as writer:
+            for spell_name, power in sorted(spells.items()):
+                writer.add(spell_name, power)
+    """
+
+    def __init__(self, path, owner, mana_capacity):
+        self.path = path
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._owner = owner.encode()
+        self._mana = mana_capacity
+        self._offsets = array("Q", [0])
+        self._powers = array("i")
+        self._last = None
+        self._file.write(b"\0" * _MAPPED_HEADER.size)  # Filled in by close()
+        self._file.write(self._owner)
+
+    def add(self, spell_name, power):
+        encoded = spell_name.encode()
+        if self._last is not None and encoded <= self._last:
+            raise ValueError(f"spells must be added in sorted order: {spell_name!r} after {self._last.decode()!r}")
+        self._powers.append(power)
+        self._file.write(encoded)
+        self._offsets.append(self._offsets[-1] + len(encoded))
+        self._last = encoded
+
+    def close(self):
+        if self._file.closed:
+            return
+        names_length = self._offsets[-1]
+        self._file.write(b"\0" * (-(_MAPPED_HEADER.size + len(self._owner) + names_length) % 8))
+        self._file.write(self._offsets.tobytes())
+        self._file.write(self._powers.tobytes())
+        self._file.seek(0)
+        self._file.write(_MAPPED_HEADER.pack(_MAPPED_MAGIC, _MAPPED_VERSION, sys.byteorder == "big",
+                                             len(self._powers), self._mana, len(self._owner), names_length))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class MappedSpellTable(Mapping):
+    """
+    Read-only {spell_name: power_level} view over a memory-mapped spell
+    book file. Opening is O(1); lookups binary-search the sorted names, so
+    only the pages they touch are read, and every process mapping the same
+    file shares those pages through the OS page cache.
+    """
+    __slots__ = ("owner", "mana", "_file", "_map", "_names_start", "_offsets", "_powers")
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file: mmap refuses zero-length maps
+            self._file.close()
+            raise ValueError(f"{path} is not a spell book file") from None
+        try:
+            self._open_sections(path)
+        except ValueError:
+            self.close()
+            raise
+
+    def _open_sections(self, path):
+        """Validates the header against the file size and maps the columns."""
+        file_size = len(self._map)
+        if file_size < _MAPPED_HEADER.size:
+            raise ValueError(f"{path} is not a spell book file")
+        magic, version, big_endian, count, self.mana, owner_length, names_length = \
+            _MAPPED_HEADER.unpack_from(self._map)
+        if magic != _MAPPED_MAGIC or version != _MAPPED_VERSION:
+            raise ValueError(f"{path} is not a version {_MAPPED_VERSION} spell book file")
+        if big_endian != (sys.byteorder == "big"):
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+
+        owner_start = _MAPPED_HEADER.size
+        self._names_start = owner_start + owner_length
+        offsets_start = self._names_start + names_length
+        offsets_start += -offsets_start % 8
+        powers_start = offsets_start + 8 * (count + 1)
+        if powers_start + 4 * count != file_size:
+            raise ValueError(f"{path} is truncated or corrupt: expected {powers_start + 4 * count} bytes, "
+                             f"found {file_size}")
+        try:
+            self.owner = self._map[owner_start:self._names_start].decode()
+        except UnicodeDecodeError:
+            raise ValueError(f"{path} is corrupt: owner name is not UTF-8") from None
+
+        with memoryview(self._map) as view:
+            self._offsets = view[offsets_start:powers_start].cast("Q")
+            self._powers = view[powers_start:powers_start + 4 * count].cast("i")
+        if self._offsets[0] != 0 or self._offsets[-1] != names_length:
+            raise ValueError(f"{path} is corrupt: name offsets don't match the name table")
+
+    def _name_bytes(self, row):
+        start = self._names_start
+        return self._map[start + self._offsets[row]:start + self._offsets[row + 1]]
+
+    def _find(self, spell_name):
+        """Row of `spell_name`, or -1."""
+        if not isinstance(spell_name, str):
+            return -1
+        encoded = spell_name.encode()
+        lo, hi = 0, len(self._powers)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name_bytes(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self._powers) and self._name_bytes(lo) == encoded else -1
+
+    def __getitem__(self, spell_name):
+        row = self._find(spell_name)
+        if row < 0:
+            raise KeyError(spell_name)
+        return self._powers[row]
+
+    def __contains__(self, spell_name):
+        return self._find(spell_name) >= 0
+
+    def __len__(self):
+        return len(self._powers)
+
+    def __iter__(self):
+        for row in range(len(self._powers)):
+            yield self._name_bytes(row).decode()
+
+    def _iter_items(self):
+        for row in range(len(self._powers)):
+            yield self._name_bytes(row).decode(), self._powers[row]
+
+    def items(self):
+        return _RowItemsView(self)
+
+    def close(self):
+        """Unmaps the file; the table is unusable afterwards."""
+        for view in (getattr(self, "_offsets", None), getattr(self, "_powers", None)):
+            if view is not None:
+                view.release()
+        self._map.close()
+        self._file.close()
+
+
+# ==========================================
+# Search Index (prefix + typo-tolerant lookup)
+# ==========================================
+def _edit_distance(a, b, max_distance):
+    """
+    Edit distance counting insertions, deletions, substitutions and swaps of
+    adjacent letters, or max_distance + 1 as soon as it must exceed it.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before_previous[j - 2] + 1)  # Transposition, e.g. "Rnue" -> "Rune"
+            current.append(cost)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+class SpellIndex:
+    """
+    Answers "which spells start with ...?" with a character trie and "did you
+    mean ...?" with a SymSpell-style deletion index: every name is filed
+    under each string obtained by deleting up to `max_distance` characters,
+    so two names within that edit distance always share an entry and a query
+    only inspects those few candidates instead of scanning the whole book.
+    Names are added incrementally as they are inscribed.
+    """
+    __slots__ = ("max_distance", "_trie", "_deletes")
+
+    def __init__(self, spell_names=(), max_distance=1):
+        self.max_distance = max_distance
+        self._trie = {}     # char -> child node; "" -> the full name ending here
+        self._deletes = {}  # deletion variant -> set of names
+        for spell_name in spell_names:
+            self.add(spell_name)
+
+    def _variants(self, word):
+        variants = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            variants |= frontier
+        return variants
+
+    def add(self, spell_name):
+        node = self._trie
+        for char in spell_name:
+            node = node.setdefault(char, {})
+        if "" in node:
+            return  # Already indexed (e.g. a power level was changed)
+        node[""] = spell_name
+        for variant in self._variants(spell_name):
+            self._deletes.setdefault(variant, set()).add(spell_name)
+
+    def complete(self, prefix, limit=10):
+        """Up to `limit` names starting with `prefix`, in sorted order."""
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        stack = [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if "" in node:
+                found.append(node[""])
+            stack.extend(node[char] for char in sorted(node, reverse=True) if char)
+        return found
+
+    def suggest(self, word, limit=5):
+        """Up to `limit` names within `max_distance` edits of `word`, closest first."""
+        candidates = set()
+        for variant in self._variants(word):
+            candidates |= self._deletes.get(variant, set())
+        scored = []
+        for candidate in candidates:
+            distance = _edit_distance(word, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                scored.append((distance, candidate))
+        return [name for _, name in sorted(scored)[:limit]]
+
+
+# ==========================================
+# Lazy Merge View
+# ==========================================
+class _MergedSpells(ChainMap):
+    """
+    The spells of MagicGrimoire.merge(..., lazy=True). Each lookup reads
+    every source book's *current* `spells`, so a source that materialises
+    into a new table on its first write (a mapped book, another lazy
+    merge) stays visible. Later books win on clashes.
+    """
+
+    def __init__(self, books):
+        self._books = books
+
+    @property
+    def maps(self):
+        return [book.spells for book in reversed(self._books)]
+
+    def copy(self):
+        return ChainMap(*self.maps)
+
+    __copy__ = copy
+
+
+# ==========================================
+# Event Hook (diagnostics)
+# ==========================================
+_event_hook = None  # Silent by default; see set_event_hook()
+
+
+def set_event_hook(hook):
+    """
+    Installs hook(event, book, message), called on grimoire lifecycle events
+    ("__init__", "__setitem__", "__add__", "update"). Pass None to silence
+    them again. Returns the previously installed hook.
+    """
+    global _event_hook
+    previous, _event_hook = _event_hook, hook
+    return previous
+
+
+def print_event(event, book, message):
+    """A ready-made hook that narrates every event on the terminal."""
+    print(f"--> [{event}] {message}")
+
+
 class MagicGrimoire:
     """
     A class representing a Wizard's Spellbook.
     Demonstrates the power of Python's Magic (Dunder) Methods.
     """
+    # No per-instance __dict__: thousands of small books stay cheap
+    __slots__ = ("owner", "mana", "spells", "_table_type", "_index")
 
     # ==========================================
     # 1. Initialization & Construction
     # ==========================================
-    def __init__(self, owner, mana_capacity):
-        """Called when a new object is created: book = MagicGrimoire(...)"""
+    def __init__(self, owner, mana_capacity, compact=False):
+        """
+        Called when a new object is created: book = MagicGrimoire(...)
+        compact=True stores the spells in a SpellTable instead of a dict.
+        """
         self.owner = owner
         self.mana = mana_capacity
-        self.spells = {}  # Dictionary to store {spell_name: power_level}
-        print(f"--> [__init__] A new Grimoire bound to {self.owner} created.")
+        self._table_type = SpellTable if compact else dict
+        self._index = None  # Optional SpellIndex, see build_index()
+        self.spells = self._table_type()  # Dictionary to store {spell_name: power_level}
+        if _event_hook is not None:
+            _event_hook("__init__", self, f"A new Grimoire bound to {self.owner} created.")
 
     # ==========================================
     # 2. String Representation
@@ -29,7 +520,7 @@ class MagicGrimoire:
         Called by: repr(book) or checking the object in the interactive shell.
         Purpose: An unambiguous string for developers (often used for debugging).
         """
-        return f"MagicGrimoire(owner='{self.owner}', mana={self.mana}, spells={self.spells})"
+        return f"MagicGrimoire(owner='{self.owner}', mana={self.mana}, spells={dict(self.spells)})"
 
     # ==========================================
     # 3. Container Emulation (Dictionary behavior)
@@ -42,17 +533,80 @@ class MagicGrimoire:
         """Called by: book['Fireball']"""
         if spell_name in self.spells:
             return f"Reading spell details: {spell_name} (Power: {self.spells[spell_name]})"
+        if self._index is not None and isinstance(spell_name, str):
+            suggestions = self._index.suggest(spell_name, limit=1)
+            if suggestions:
+                return f"Spell not found (The pages are blank). Did you mean '{suggestions[0]}'?"
         return "Spell not found (The pages are blank)."
 
     def __setitem__(self, spell_name, power):
         """Called by: book['Fireball'] = 50"""
-        self.spells[spell_name] = power
-        print(f"--> [__setitem__] Inscribed '{spell_name}' with power {power}.")
+        self._writable_spells()[spell_name] = power
+        if self._index is not None:
+            self._index.add(spell_name)
+        if _event_hook is not None:
+            _event_hook("__setitem__", self, f"Inscribed '{spell_name}' with power {power}.")
 
     def __contains__(self, spell_name):
         """Called by: 'Fireball' in book"""
         return spell_name in self.spells
 
+    def build_index(self, max_distance=1):
+        """
+        Called by: book.build_index()
+        Purpose: Enables complete() and suggest(). The index then follows every
+        new inscription, and unknown spell lookups offer the closest match.
+        Each extra unit of max_distance makes the index roughly `name length`
+        times larger and its queries that much slower.
+        """
+        self._index = SpellIndex(self.spells, max_distance)
+        return self._index
+
+    def complete(self, prefix, limit=10):
+        """Called by: book.complete('Fire') -> spells starting with 'Fire'"""
+        if self._index is None:
+            return sorted(name for name in self.spells if name.startswith(prefix))[:limit]  # O(n) scan
+        return self._index.complete(prefix, limit)
+
+    def suggest(self, spell_name, limit=5):
+        """Called by: book.suggest('Firebal') -> known spells with similar names"""
+        if self._index is None:
+            scored = ((_edit_distance(spell_name, name, 1), name) for name in self.spells)  # O(n) scan
+            return [name for distance, name in sorted(scored)[:limit] if distance <= 1]
+        return self._index.suggest(spell_name, limit)
+
+    def _writable_spells(self):
+        """Copy-on-write: a merged or memory-mapped view becomes a real table on first edit."""
+        if not isinstance(self.spells, self._table_type):
+            self.spells = self._table_type(self.spells)
+        return self.spells
+
+    def update(self, spells=(), **kwargs):
+        """
+        Called by: book.update({'Light': 10}) or book.update([('Light', 10), ...])
+        Purpose: Inscribes many spells at once, with one event for the whole batch.
+        """
+        if self._index is not None:
+            spells = dict(spells, **kwargs)  # The names are needed twice; `spells` may be a one-shot iterator
+            kwargs = {}
+        before = len(self.spells)
+        self._writable_spells().update(spells, **kwargs)
+        if self._index is not None:
+            for spell_name in spells:
+                self._index.add(spell_name)
+        if _event_hook is not None:
+            _event_hook("update", self, f"Inscribed {len(self.spells) - before} new spells in bulk.")
+
+    @classmethod
+    def from_records(cls, owner, mana_capacity, records, compact=False):
+        """
+        Called by: MagicGrimoire.from_records('Gandalf', 100, rows)
+        Purpose: Builds a whole book from (spell_name, power) pairs or a mapping.
+        """
+        book = cls(owner, mana_capacity, compact=compact)
+        book.update(records)
+        return book
+
     # ==========================================
     # 4. Arithmetic Operators (Math)
     # ==========================================
@@ -64,16 +618,75 @@ class MagicGrimoire:
         if isinstance(other, MagicGrimoire):
             new_owner = f"{self.owner} & {other.owner}"
             new_mana = self.mana + other.mana
-            new_book = MagicGrimoire(new_owner, new_mana)
+            new_book = MagicGrimoire(new_owner, new_mana, compact=self._table_type is SpellTable)
 
             # Merge spells
             new_book.spells.update(self.spells)
             new_book.spells.update(other.spells)
 
-            print(f"--> [__add__] Fused two Grimoires into one!")
+            if _event_hook is not None:
+                _event_hook("__add__", new_book, "Fused two Grimoires into one!")
             return new_book
         return NotImplemented
 
+    def __iadd__(self, other):
+        """
+        Called by: book1 += book2
+        Purpose: Absorbs another book in place, without copying our own spells.
+        """
+        if isinstance(other, MagicGrimoire):
+            self.owner = f"{self.owner} & {other.owner}"
+            self.mana += other.mana
+            self._writable_spells().update(other.spells)
+            if self._index is not None:
+                for spell_name in other.spells:
+                    self._index.add(spell_name)
+            return self
+        return NotImplemented
+
+    @classmethod
+    def merge(cls, *books, lazy=False, compact=False):
+        """
+        Called by: MagicGrimoire.merge(book1, book2, book3, ...)
+        Purpose: Fuses any number of books at once. Later books win on clashes,
+        like chained `+`, but each spell is copied only once (not once per step).
+
+        With lazy=True nothing is copied: the new book reads through a ChainMap
+        over the originals (so it sees their later changes) until its first
+        write, which materialises it into its own dictionary.
+        """
+        new_book = cls(" & ".join(book.owner for book in books), sum(book.mana for book in books), compact=compact)
+        if lazy:
+            new_book.spells = _MergedSpells(books)
+        else:
+            for book in books:
+                new_book.spells.update(book.spells)
+        return new_book
+
+    # ==========================================
+    # 4b. Persistence (memory-mapped files)
+    # ==========================================
+    def save_mapped(self, path):
+        """
+        Called by: book.save_mapped('gandalf.grimoire')
+        Purpose: Writes the book in the binary format read by open_mapped().
+        """
+        with MappedGrimoireWriter(path, self.owner, self.mana) as writer:
+            for spell_name, power in sorted(self.spells.items()):
+                writer.add(spell_name, power)
+
+    @classmethod
+    def open_mapped(cls, path, compact=False):
+        """
+        Called by: MagicGrimoire.open_mapped('gandalf.grimoire')
+        Purpose: Opens a saved book instantly; spells are read from the file
+        on demand, and the first write copies them into memory.
+        """
+        table = MappedSpellTable(path)
+        book = cls(table.owner, table.mana, compact=compact)
+        book.spells = table
+        return book
+
     # ==========================================
     # 5. Comparison Operators
     # ==========================================
@@ -102,6 +715,9 @@ class MagicGrimoire:
 # ==========================================
 if __name__ == "__main__":
 
+    # Narrate every event for this tour; library code stays silent by default
+    set_event_hook(print_event)
+
     print("--- 1. Initialization (__init__) ---")
     gandalf_book = MagicGrimoire("Gandalf", 100)
     saruman_book = MagicGrimoire("Saruman", 80)
@@ -131,12 +747,54 @@ if __name__ == "__main__":
     if gandalf_book > saruman_book:
         print(f"{gandalf_book.owner}'s book is stronger than {saruman_book.owner}'s.")
 
-    print("\n--- 5. Arithmetic (__add__) ---")
+    print("\n--- 5. Arithmetic (__add__, __iadd__, merge) ---")
     # This triggers __add__. It creates a new book merging both.
     merged_book = gandalf_book + saruman_book
     print(merged_book)  # Uses __str__ on the new book
 
+    # merge() fuses many books at once; lazy=True shares the originals until the first write
+    radagast_book = MagicGrimoire("Radagast", 60)
+    radagast_book['Fireball'] = 35
+    council_book = MagicGrimoire.merge(gandalf_book, saruman_book, radagast_book, lazy=True)
+    print(council_book['Fireball'])  # Radagast's version wins: he was merged last
+    council_book['Shield'] = 20  # Copy-on-write: the originals stay untouched
+    print(f"{council_book} / Gandalf still has {len(gandalf_book)} spells")
+
+    # This triggers __iadd__: Saruman's book absorbs Radagast's in place
+    saruman_book += radagast_book
+    print(saruman_book)
+
     print("\n--- 6. Callable (__call__) ---")
     # We are calling the object instance as if it were a function!
     cast_result = gandalf_book('Fireball')
-    print(cast_result)
\ No newline at end of file
+    print(cast_result)
+
+    print("\n--- 7. Compact Storage (SpellTable) ---")
+    # Same dunder protocol, but names and powers live in packed buffers
+    library_book = MagicGrimoire("Library", 1000, compact=True)
+    library_book['Fireball'] = 50
+    print(library_book['Fireball'], 'Fireball' in library_book, len(library_book))
+    memory = benchmark_spell_memory(200_000)
+    print(f"200k spells: dict {memory['dict_bytes'] / 1e6:.1f} MB vs "
+          f"SpellTable {memory['SpellTable_bytes'] / 1e6:.1f} MB ({memory['ratio']:.1f}x smaller)")
+
+    print("\n--- 8. Bulk Loading (update, from_records) ---")
+    # One event for the whole batch instead of one line per spell
+    started = time.perf_counter()
+    archive_book = MagicGrimoire.from_records("Archive", 5000, ((f"Rune {i}", i % 100) for i in range(100_000)))
+    print(f"{archive_book} loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    print("\n--- 9. Memory-Mapped Files (save_mapped, open_mapped) ---")
+    mapped_path = os.path.join(tempfile.gettempdir(), "archive.grimoire")
+    archive_book.save_mapped(mapped_path)
+    started = time.perf_counter()
+    mapped_book = MagicGrimoire.open_mapped(mapped_path)
+    print(f"{mapped_book} opened in {(time.perf_counter() - started) * 1e6:.0f} us")
+    print(mapped_book['Rune 4242'], 'Rune 99999' in mapped_book, 'Rune -1' in mapped_book)
+
+    print("\n--- 10. Search Index (complete, suggest) ---")
+    gandalf_book.build_index()
+    gandalf_book['Fire Wall'] = 70  # New spells are indexed as they are inscribed
+    print(gandalf_book.complete('Fire'))
+    print(gandalf_book['Firebal'])
+    print(gandalf_book.suggest('Lihgt'))
\ No newline at end of file